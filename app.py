@@ -1,21 +1,46 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, send_file, url_for, jsonify, Response, stream_with_context
 import pandas as pd
-import plotly.graph_objs as go
-import plotly.io as pio
 import io
-from src.forecast_utils import forecast_next_months
-from src.utils import validate_city_and_target
-from src.logger import get_logger
-import sys
+from src.model_loader import preload_models
+from src.forecast_service import run_forecast, iter_forecasts, validate_job, get_result_column, save_result, get_result, REGIONS
+from src.scenario_forecast import forecast_scenarios, validate_scenario_options
+from src.jobs import submit_job, run_job, get_job, get_job_stats, QueueFullError, GENERIC_JOB_ERROR
+from src.data_loader import get_city_data_path, get_last_date as get_dataset_last_date
+from src.feature_updater import append_month
+from src.logger import get_logger, request_id_var
+from src.metrics import timer, observe, render_metrics
+from src.forecast_cache import get_forecast_cache_stats
+from src.model_loader import get_model_stats
+from src.data_loader import get_dataset_stats
 import os
+import json
+import queue
+import time
+import uuid
+import importlib.util
+import importlib.metadata
 import numpy as np
-from src.google_sheets_utils import read_sheet_as_df, write_df_to_sheet, append_row_to_sheet
 
 
-logger = get_logger()
+logger = get_logger(__name__)
 
 app = Flask(__name__)
 
+# Unpickle every model once per worker so /forecast never pays for joblib.load
+if os.environ.get('PRELOAD_MODELS', '1') == '1':
+    preload_models()
+
+# plotly.js bundled with the plotly package, served from /plotly.min.js
+PLOTLY_JS_PATH = os.path.join(os.path.dirname(importlib.util.find_spec('plotly').origin), 'package_data', 'plotly.min.js')
+PLOTLY_JS_VERSION = importlib.metadata.version('plotly')
+
+# Upper bound on jobs in one /api/forecast call
+MAX_API_JOBS = int(os.environ.get('MAX_API_JOBS', 100))
+# Upper bound on city x target jobs in one /api/forecast/bulk call
+MAX_BULK_JOBS = int(os.environ.get('MAX_BULK_JOBS', 1000))
+# Longest a request thread waits for its forecast job before answering 503
+FORECAST_REQUEST_TIMEOUT = float(os.environ.get('FORECAST_REQUEST_TIMEOUT', 120))
+
 CITY_TO_REGION = {
     "mumbai": "Western Region",
     "delhi": "Northern Region",
@@ -24,15 +49,30 @@ CITY_TO_REGION = {
     "india": "India"
 }
 
+@app.before_request
+def start_request():
+    # Reuse an upstream id (router / load balancer) so log lines can be joined across hops
+    request_id_var.set(request.headers.get('X-Request-ID') or uuid.uuid4().hex[:12])
+    request.start_time = time.perf_counter()
+
+@app.after_request
+def finish_request(response):
+    duration_ms = (time.perf_counter() - request.start_time) * 1000
+    response.headers['X-Request-ID'] = request_id_var.get()
+    if request.endpoint not in ('static', 'plotly_js', 'metrics'):
+        observe('http_request', duration_ms / 1000, endpoint=request.endpoint or 'unknown', status=response.status_code)
+        logger.info("%s %s -> %d in %.1f ms", request.method, request.path, response.status_code, duration_ms,
+                    extra={'method': request.method, 'path': request.path, 'status': response.status_code,
+                           'duration_ms': round(duration_ms, 3)})
+    return response
+
 @app.route('/')
 def home():
     city = request.args.get('city')
     next_date_msg = ""
     if city:
-        file_path = f"data/{city}_pr.csv"
         try:
-            df = pd.read_csv(file_path, parse_dates=['date'], dayfirst=True)
-            last_date = df['date'].max()
+            last_date = get_dataset_last_date(city)
             next_month = (last_date + pd.DateOffset(months=1)).strftime('%B %Y')
             next_date_msg = f"Please Input Values for Next Month - {next_month}"
         except Exception:
@@ -40,11 +80,10 @@ def home():
     return render_template('index.html', next_date_msg=next_date_msg)
 
 def get_last_date(city):
-    file_path = f"data/{city}_pr.csv"
+    file_path = get_city_data_path(city)
     try:
-        df = pd.read_csv(file_path, parse_dates=['date'], dayfirst=True)
-        last_date = df['date'].max()
-        logger.info(f"Successfully read {file_path}. Last date: {last_date.strftime('%d-%m-%Y')}")
+        last_date = get_dataset_last_date(city)
+        logger.debug("Successfully read %s. Last date: %s", file_path, last_date)
         return last_date
     except Exception as e:
         logger.error(f"Error reading {file_path}: {e}")
@@ -60,121 +99,251 @@ def forecast():
         if not city or not target or not months:
             return render_template('index.html', error="All fields are required.")
 
-        regions = ['mumbai', 'delhi', 'chennai', 'durgapur']
         region_label = CITY_TO_REGION.get(city, city.title())
-        # --- All India CSV completeness check ---
-        if city == "india":
-            last_dates = {region: get_last_date(region) for region in regions}
-            if None in last_dates.values():
-                return render_template('index.html', error="Could not read all region CSV files. Check logs.")
-            if len(set(last_dates.values())) > 1:
-                logger.warning(f"CSV files not complete for all regions. Last dates: {last_dates}")
-                return render_template('index.html', error="All region CSVs must be filled to the same date for Whole India prediction. Please update missing months.")
-            logger.info(f"All region CSVs complete for Whole India prediction. Last date: {list(last_dates.values())[0].strftime('%d-%m-%Y')}")
-
-        # Handle "Whole India" selection
-        if city == "india":
-            region_forecasts = []
-            city_names = ['mumbai', 'delhi', 'chennai', 'durgapur']
-            for region in city_names:
-                retail_df = forecast_next_months(region, "retail_sales", months)
-                non_retail_df = forecast_next_months(region, "non_retail_sales", months)
-                try:
-                    stock_var = forecast_next_months(region, "stock_var", months)
-                except Exception:
-                    stock_var = None
-                merged = pd.merge(retail_df, non_retail_df, on="date", how="inner")
-                if stock_var is not None and 'predicted_stock_var' in stock_var.columns:
-                    merged = pd.merge(merged, stock_var[['date', 'predicted_stock_var']], on="date", how="left")
-                else:
-                    merged['predicted_stock_var'] = 0
-                merged['city'] = region
-                merged['predicted_total_sales'] = merged['predicted_retail_sales'] + merged['predicted_non_retail_sales']
-                region_forecasts.append(merged)
-
-            all_cities_df = pd.concat(region_forecasts, ignore_index=True)
-            india_months = np.sort(all_cities_df['date'].unique())
-            india_results = []
-            city_month_df = all_cities_df.copy()
-
-            for idx, month in enumerate(india_months):
-                month_df = city_month_df[city_month_df['date'] == month]
-                total_sales_sum = month_df['predicted_total_sales'].sum()
-                stock_var_sum = month_df['predicted_stock_var'].sum() if 'predicted_stock_var' in month_df.columns else 0
-
-                # Rule 1: If total_sales < 275k, add to next month's stock_var
-                if total_sales_sum < 275_000 and idx + 1 < len(india_months):
-                    next_month = india_months[idx + 1]
-                    add_val = float(275_000 - total_sales_sum)
-                    city_month_df.loc[city_month_df['date'] == next_month, 'predicted_stock_var'] = (
-                        city_month_df.loc[city_month_df['date'] == next_month, 'predicted_stock_var'].astype(float) + add_val
-                    )
-
-                # Rule 2: If stock_var > 250k, distribute excess to non_retail_sales in ratio of total_sales
-                if stock_var_sum > 250_000:
-                    excess = stock_var_sum - 250_000
-                    ratios = month_df['predicted_total_sales'] / total_sales_sum if total_sales_sum > 0 else 0
-                    for city_idx, row in month_df.iterrows():
-                        add_val = excess * ratios.loc[city_idx]
-                        city_month_df.loc[city_idx, 'predicted_non_retail_sales'] += add_val
-
-                india_results.append({
-                    'date': month,
-                    'predicted_total_sales': city_month_df[city_month_df['date'] == month]['predicted_total_sales'].sum(),
-                    'predicted_retail_sales': city_month_df[city_month_df['date'] == month]['predicted_retail_sales'].sum(),
-                    'predicted_non_retail_sales': city_month_df[city_month_df['date'] == month]['predicted_non_retail_sales'].sum(),
-                })
-
-            forecast_df = pd.DataFrame(india_results)
-            y_col = f'predicted_{target}' if target != "total_sales" else "predicted_total_sales"
+        try:
+            job = validate_job(city, target, months)
+            # Computed on the bounded job pool; identical concurrent requests share one run
+            with timer('forecast_request', city=job[0], target=job[1]):
+                forecast_df = run_job(run_forecast, *job, key=('forecast', job), timeout=FORECAST_REQUEST_TIMEOUT)
+        except ValueError as e:
+            return render_template('index.html', error=str(e))
+        except RuntimeError:
+            # Details were logged by the job
+            return render_template('index.html', error="Something went wrong. Check logs.")
+        except (QueueFullError, TimeoutError) as e:
+            logger.warning(f"Forecast not served: {e}")
+            return render_template('index.html', error="The server is busy with other forecasts. Please try again shortly."), 503
+
+        with timer('render'):
+            y_col = get_result_column(target)
             plot_title = f"{months}-Month Forecast for {target.replace('_', ' ').title()} in {region_label}"
 
-        else:
-            # Handle total_sales for a single region
-            if target == "total_sales":
-                retail_df = forecast_next_months(city, "retail_sales", months)
-                non_retail_df = forecast_next_months(city, "non_retail_sales", months)
-                forecast_df = pd.merge(retail_df, non_retail_df, on="date", how="inner")
-                forecast_df['predicted_total_sales'] = forecast_df['predicted_retail_sales'] + forecast_df['predicted_non_retail_sales']
-                y_col = 'predicted_total_sales'
-                plot_title = f"{months}-Month Forecast for Total Sales in {region_label}"
-            else:
-                forecast_df = forecast_next_months(city, target, months)
-                y_col = f'predicted_{target}'
-                plot_title = f"{months}-Month Forecast for {target.replace('_', ' ').title()} in {region_label}"
-
-        if forecast_df is None or forecast_df.empty:
-            return render_template('index.html', error="Forecast failed or returned no data.")
-
-        # Plotly figure
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=forecast_df['date'],
-            y=forecast_df[y_col],
-            mode='lines+markers',
-            name=f'Forecasted {target}'
-        ))
-        fig.update_layout(title=plot_title,
-                          xaxis_title="Date",
-                          yaxis_title="Sales")
-
-        plot_html = pio.to_html(fig, full_html=False)
-
-        # CSV export
-        csv_buffer = io.StringIO()
-        forecast_df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-
-        return render_template('result.html',
-                               plot_html=plot_html,
-                               csv_data=csv_data,
-                               filename=f"{region_label.replace(' ', '_').lower()}_{target}_forecast.csv")
+            # Only the trace data goes to the page; plotly.js is served once as a cached asset
+            figure = {
+                "data": [{
+                    "type": "scatter",
+                    "x": forecast_df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                    "y": forecast_df[y_col].tolist(),
+                    "mode": "lines+markers",
+                    "name": f"Forecasted {target}",
+                }],
+                "layout": {"title": {"text": plot_title}, "xaxis": {"title": {"text": "Date"}}, "yaxis": {"title": {"text": "Sales"}}},
+            }
+
+            return render_template('result.html',
+                                   figure=figure,
+                                   plotly_js_url=url_for('plotly_js', v=PLOTLY_JS_VERSION),
+                                   forecast_id=save_result(forecast_df),
+                                   city=city,
+                                   target=target,
+                                   months=months,
+                                   filename=f"{region_label.replace(' ', '_').lower()}_{target}_forecast.csv")
 
     except Exception as e:
         logger.info(f"User submitted forecast request: city={city}, target={target}, months={months}")
         logger.error(f"Error while forecasting: {str(e)}")
         return render_template('index.html', error="Something went wrong. Check logs.")
 
+def forecast_to_json(job, forecast_df, error):
+    city, target, months = job
+    result = {"city": city, "target": target, "months": months}
+    if error:
+        result["error"] = error
+        return result
+    values = forecast_df[get_result_column(target)].astype(float)
+    result["dates"] = forecast_df['date'].dt.strftime('%Y-%m-%d').tolist()
+    result["values"] = [None if np.isnan(v) else v for v in values.tolist()]
+    return result
+
+def forecast_batch(jobs, kind=None):
+    return [forecast_to_json(*result) for result in iter_forecasts(jobs, kind)]
+
+def stream_batch(jobs, results):
+    """Pool job behind ?stream=1: hands each JSON result to the request thread as soon as it is ready."""
+    try:
+        for result in iter_forecasts(jobs):
+            results.put(forecast_to_json(*result))
+    finally:
+        results.put(None)
+
+def parse_api_jobs():
+    """Validated (city, target, months) jobs from the JSON body, or raise ValueError."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object with a 'jobs' list.")
+    raw_jobs = payload.get('jobs', [payload] if 'city' in payload else None)
+    if not isinstance(raw_jobs, list) or not raw_jobs:
+        raise ValueError("Expected a non-empty 'jobs' list.")
+    if len(raw_jobs) > MAX_API_JOBS:
+        raise ValueError(f"At most {MAX_API_JOBS} jobs per request.")
+
+    jobs = []
+    for i, item in enumerate(raw_jobs):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Each job must be an object with city, target and months.")
+            jobs.append(validate_job(item.get('city'), item.get('target'), item.get('months', 6)))
+        except ValueError as e:
+            raise ValueError(f"Job {i}: {e}")
+    return jobs
+
+def busy_response(e):
+    logger.warning(f"Rejecting forecast request: {e}")
+    response = jsonify({"error": "Server busy, retry shortly."})
+    response.headers['Retry-After'] = '5'
+    return response, 429
+
+@app.route('/api/forecast', methods=['POST'])
+def api_forecast():
+    """
+    JSON forecasts for a batch of jobs: {"jobs": [{"city", "target", "months"}, ...]}.
+    Per-model forecasts are shared between jobs. With ?stream=1 (or Accept: application/x-ndjson)
+    each job's result is written as one NDJSON line as soon as it is ready.
+    """
+    try:
+        jobs = parse_api_jobs()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stream = request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
+    if stream:
+        # Computed on the bounded job pool like every other forecast; lines follow as results arrive
+        results = queue.Queue()
+        try:
+            submit_job(stream_batch, jobs, results)
+        except QueueFullError as e:
+            return busy_response(e)
+
+        def generate():
+            deadline = time.monotonic() + FORECAST_REQUEST_TIMEOUT
+            sent = 0
+            error = GENERIC_JOB_ERROR
+            while sent < len(jobs):
+                try:
+                    result = results.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    logger.error(f"Streamed forecast timed out after {sent} of {len(jobs)} jobs")
+                    error = "Forecast timed out. Submit it to /api/forecast/jobs instead."
+                    break
+                if result is None:
+                    break
+                sent += 1
+                yield json.dumps(result) + "\n"
+            for job in jobs[sent:]:
+                yield json.dumps(forecast_to_json(job, None, error)) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    try:
+        results = run_job(forecast_batch, jobs, key=('batch', tuple(jobs)), timeout=FORECAST_REQUEST_TIMEOUT)
+    except QueueFullError as e:
+        return busy_response(e)
+    except TimeoutError as e:
+        logger.error(f"API forecast timed out: {e}")
+        return jsonify({"error": "Forecast timed out. Submit it to /api/forecast/jobs instead."}), 503
+    return jsonify({"results": results})
+
+@app.route('/api/forecast/bulk', methods=['POST'])
+def api_forecast_bulk():
+    """
+    Every city x target in one vectorized pass: {"cities": [...], "targets": [...], "months": 6}.
+    Cities default to every region and targets to retail and non-retail sales.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object."}), 400
+    cities = payload.get('cities', REGIONS)
+    targets = payload.get('targets', ['retail_sales', 'non_retail_sales'])
+    if not isinstance(cities, list) or not isinstance(targets, list) or not cities or not targets:
+        return jsonify({"error": "'cities' and 'targets' must be non-empty lists."}), 400
+    if len(cities) * len(targets) > MAX_BULK_JOBS:
+        return jsonify({"error": f"At most {MAX_BULK_JOBS} city x target jobs per request."}), 400
+    try:
+        jobs = [validate_job(city, target, payload.get('months', 6)) for city in cities for target in targets]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        results = run_job(forecast_batch, jobs, 'panel', key=('bulk', tuple(jobs)), timeout=FORECAST_REQUEST_TIMEOUT)
+    except QueueFullError as e:
+        return busy_response(e)
+    except TimeoutError as e:
+        logger.error(f"Bulk forecast timed out: {e}")
+        return jsonify({"error": "Forecast timed out. Submit it to /api/forecast/jobs instead."}), 503
+    return jsonify({"results": results})
+
+def scenarios_to_json(city, target, months, options):
+    forecast_df = forecast_scenarios(city, target, months, **options)
+    column = get_result_column(target)
+    return {
+        "city": city, "target": target, "months": months, "paths": forecast_df.attrs['paths'],
+        "dates": forecast_df['date'].dt.strftime('%Y-%m-%d').tolist(),
+        "bands": {col[len(column) + 1:]: forecast_df[col].tolist() for col in forecast_df.columns if col != 'date'},
+    }
+
+@app.route('/api/forecast/scenarios', methods=['POST'])
+def api_forecast_scenarios():
+    """
+    P10/P50/P90 bands over sampled input scenarios: {"city", "target", "months", "paths",
+    "shocks": {"primary_price_avg": [-0.1, 0, 0.1]}, "bootstrap": true, "seed": 0, "simulator": "linear"}.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object."}), 400
+    options = {name: payload[name] for name in ('paths', 'simulator', 'shocks', 'bootstrap', 'seed') if name in payload}
+    try:
+        city, target, months = validate_job(payload.get('city'), payload.get('target'), payload.get('months', 6))
+        validate_scenario_options(options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        key = ('scenarios', city, target, months, json.dumps(options, sort_keys=True))
+        result = run_job(scenarios_to_json, city, target, months, options, key=key, timeout=FORECAST_REQUEST_TIMEOUT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError:
+        # Details were logged by the job
+        return jsonify({"error": GENERIC_JOB_ERROR}), 500
+    except QueueFullError as e:
+        return busy_response(e)
+    except TimeoutError as e:
+        logger.error(f"Scenario forecast timed out: {e}")
+        return jsonify({"error": "Forecast timed out. Try fewer paths."}), 503
+    return jsonify(result)
+
+@app.route('/api/forecast/jobs', methods=['POST'])
+def api_submit_forecast_job():
+    """Queue a /api/forecast batch and return its job id immediately (202)."""
+    try:
+        jobs = parse_api_jobs()
+        job_id = submit_job(forecast_batch, jobs, key=('batch', tuple(jobs)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFullError as e:
+        return busy_response(e)
+    return jsonify({"job_id": job_id, "status_url": url_for('api_forecast_job', job_id=job_id)}), 202
+
+@app.route('/api/forecast/jobs/<job_id>')
+def api_forecast_job(job_id):
+    """Job status; ?wait=N long-polls up to N seconds for the result."""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds."}), 400
+    job = get_job(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id."}), 404
+    body = {"job_id": job_id, "status": job['status']}
+    if job['status'] == 'done':
+        body["results"] = job['result']
+    elif job['status'] == 'failed':
+        body["error"] = job['error']
+    return jsonify(body)
+
+@app.route('/api/jobs/stats')
+def api_job_stats():
+    return jsonify(get_job_stats())
+
 @app.route('/feature_engineer', methods=['POST'])
 def feature_engineer():
     try:
@@ -185,57 +354,13 @@ def feature_engineer():
         retail_sales = float(request.form.get('retail_sales', 0))
         non_retail_sales = float(request.form.get('non_retail_sales', 0))
 
-        file_path = f"data/{city}_pr.csv"
-        df = pd.read_csv(file_path, parse_dates=['date'], dayfirst=True)
-        df = df.replace(r'^\s*$', np.nan, regex=True)
-        df = df.sort_values('date').reset_index(drop=True)
-
-        # Ensure numeric columns are float BEFORE appending
-        for col in ['primary_price_avg', 'secondary_price_avg', 'stock_var', 'retail_sales', 'non_retail_sales']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # Compute next date
-        last_date = df['date'].max()
-        next_date = last_date + pd.DateOffset(months=1)
-
-        # Append new row
-        new_row = {
-            'date': next_date,
+        next_date = append_month(city, {
             'primary_price_avg': primary_price_avg,
             'secondary_price_avg': secondary_price_avg,
             'stock_var': stock_var,
             'retail_sales': retail_sales,
             'non_retail_sales': non_retail_sales,
-        }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df = df.sort_values('date').reset_index(drop=True)
-
-        # Ensure numeric columns are float (AFTER append)
-        for col in ['primary_price_avg', 'secondary_price_avg', 'stock_var', 'retail_sales', 'non_retail_sales']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # Feature engineering
-        df['price_diff'] = df['primary_price_avg'] - df['secondary_price_avg']
-        df['total_sales'] = df['retail_sales'] + df['non_retail_sales']
-        for col in ['primary_price_avg', 'secondary_price_avg', 'stock_var', 'retail_sales', 'non_retail_sales', 'price_diff']:
-            for lag in [1, 2, 3]:
-                df[f'{col}_lag_{lag}'] = df[col].shift(lag)
-        df['primary_price_roll3'] = df['primary_price_avg'].rolling(3, min_periods=1, center=True).mean()
-        df['secondary_price_roll3'] = df['secondary_price_avg'].rolling(3, min_periods=1, center=True).mean()
-        df['retail_sales_roll3'] = df['retail_sales'].rolling(3, min_periods=1, center=True).mean()
-        df['non_retail_sales_roll3'] = df['non_retail_sales'].rolling(3, min_periods=1, center=True).mean()
-        df['trend_index'] = range(1, len(df) + 1)
-        df['month_number'] = df['date'].dt.month
-        df['month'] = df['date'].dt.month
-        n = len(df)
-        non_retail = df['non_retail_sales'].copy()
-        if n >= 2:
-            non_retail.iloc[-1] = non_retail.iloc[-2]
-        df['non_retail_sales_custom_avg'] = non_retail.rolling(3, min_periods=1, center=True).mean()
-        df['date'] = df['date'].dt.strftime('%d-%m-%Y')
-
-        # Save back to CSV
-        df.to_csv(file_path, index=False)
+        })
 
         next_next_date = (pd.to_datetime(next_date) + pd.DateOffset(months=1)).strftime('%B %Y')
         return render_template('index.html', message="Row added and features updated!", next_date_msg=f"Please Input Values for Next Month - {next_next_date}")
@@ -246,15 +371,45 @@ def feature_engineer():
 
 @app.route('/download', methods=['POST'])
 def download():
-    csv_data = request.form['csv_data']
     filename = request.form['filename']
+    forecast_df = get_result(request.form.get('forecast_id', ''))
+    if forecast_df is None:
+        # Evicted, or rendered by another worker: recompute (served from the forecast cache)
+        try:
+            job = validate_job(request.form.get('city'), request.form.get('target'), request.form.get('months'))
+            forecast_df = run_job(run_forecast, *job, key=('forecast', job), timeout=FORECAST_REQUEST_TIMEOUT)
+        except (ValueError, RuntimeError) as e:
+            logger.error(f"Error rebuilding forecast for download: {e}")
+            return render_template('index.html', error="Forecast is no longer available. Please run it again.")
+        except (QueueFullError, TimeoutError) as e:
+            logger.warning(f"Download not served: {e}")
+            return render_template('index.html', error="The server is busy with other forecasts. Please try again shortly."), 503
+
+    csv_buffer = io.StringIO()
+    forecast_df.to_csv(csv_buffer, index=False)
     return send_file(
-        io.BytesIO(csv_data.encode()),
+        io.BytesIO(csv_buffer.getvalue().encode()),
         mimetype='text/csv',
         as_attachment=True,
         download_name=filename
     )
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: stage histograms plus cache and job-queue counters for this worker."""
+    gauges = {}
+    for prefix, stats in (('forecast_jobs', get_job_stats()), ('forecast_cache', get_forecast_cache_stats()),
+                          ('model_registry', get_model_stats()), ('dataset_cache', get_dataset_stats())):
+        for name, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"{prefix}_{name}"] = value
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/plotly.min.js')
+def plotly_js():
+    # Versioned URL, so browsers and proxies may cache it for a year
+    return send_file(PLOTLY_JS_PATH, mimetype='application/javascript', max_age=365 * 24 * 3600)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
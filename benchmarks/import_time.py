@@ -0,0 +1,79 @@
+"""
+Cold-start import profile of the web app, from `python -X importtime` in a fresh interpreter.
+
+    python -m benchmarks.import_time --top 25 --json import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+def profile_imports(module='app', preload=False):
+    """
+    Import `module` in a fresh interpreter under -X importtime.
+    Returns:
+        list: {'module', 'self_us', 'cumulative_us', 'depth'} per imported module, in import order
+    """
+    env = dict(os.environ, PRELOAD_MODELS='1' if preload else '0')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, env=env, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+        })
+    return rows
+
+
+def top_level_packages(rows):
+    """Total self import time per top-level package, slowest first."""
+    totals = {}
+    for row in rows:
+        package = row['module'].split('.')[0]
+        totals[package] = totals.get(package, 0) + row['self_us']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def run(module, repeats, preload):
+    totals, rows = [], []
+    for _ in range(repeats):
+        rows = profile_imports(module, preload)
+        totals.append(next(r['cumulative_us'] for r in reversed(rows) if r['module'] == module))
+    return {
+        'module': module,
+        'preload_models': preload,
+        'median_total_ms': statistics.median(totals) / 1000,
+        'packages_ms': {name: us / 1000 for name, us in top_level_packages(rows)},
+        'loaded': [r['module'] for r in rows],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile cold-start imports of the web app.")
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--preload', action='store_true', help="Also preload models (PRELOAD_MODELS=1)")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', help="Write the full report to this path")
+    args = parser.parse_args()
+
+    report = run(args.module, args.repeats, args.preload)
+    print(f"import {report['module']}: {report['median_total_ms']:.1f} ms (median of {args.repeats})")
+    for name, ms in list(report['packages_ms'].items())[:args.top]:
+        print(f"  {name:<28} {ms:8.1f} ms")
+    for heavy in ('gspread', 'oauth2client', 'plotly', 'sklearn', 'joblib', 'xgboost'):
+        if heavy in {m.split('.')[0] for m in report['loaded']}:
+            print(f"⚠️ {heavy} is imported at startup")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
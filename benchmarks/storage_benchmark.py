@@ -0,0 +1,78 @@
+"""
+Read latency of the city dataset storage backends as history and city count grow.
+
+    python -m benchmarks.storage_benchmark --rows 36 1000 6000 --cities 4 50 --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from benchmarks.synthetic import make_city_frame
+from src import storage
+
+
+def available_backends():
+    backends = ['csv', 'npz']
+    try:
+        import pyarrow  # noqa: F401
+        backends += ['parquet', 'feather']
+    except ImportError:
+        pass
+    return backends
+
+
+def time_reads(paths, backend, repeats):
+    """Median seconds to read and decode every file in `paths` once."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            with open(path, 'rb') as f:
+                storage.decode_frame(f.read(), backend)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(rows_list, cities_list, backends, repeats):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in rows_list:
+            df = make_city_frame(rows)
+            for backend in backends:
+                raw = storage.encode_frame(df, backend)
+                for cities in cities_list:
+                    paths = []
+                    for i in range(cities):
+                        path = os.path.join(tmp, f"city{i}_pr.{storage.EXTENSIONS[backend]}")
+                        with open(path, 'wb') as f:
+                            f.write(raw)
+                        paths.append(path)
+                    seconds = time_reads(paths, backend, repeats)
+                    results.append({
+                        'backend': backend,
+                        'rows': rows,
+                        'cities': cities,
+                        'bytes_per_city': len(raw),
+                        'read_ms': round(seconds * 1000, 3),
+                        'read_ms_per_city': round(seconds * 1000 / cities, 3),
+                    })
+                    print(f"{backend:8s} rows={rows:6d} cities={cities:4d} "
+                          f"size={len(raw) / 1024:8.1f} KB  read={seconds * 1000:9.2f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[36, 360, 1000, 3000, 6000])
+    parser.add_argument('--cities', type=int, nargs='+', default=[4, 50])
+    parser.add_argument('--backends', nargs='+', default=available_backends())
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.cities, args.backends, args.repeats)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
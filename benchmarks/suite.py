@@ -0,0 +1,274 @@
+"""
+End-to-end benchmarks for forecasting, Whole India aggregation, scenario bands, data-entry
+appends and batch training on synthetic cities. Everything runs inside a throwaway workspace (data/, models/,
+logs/), so the repository's datasets and models are never touched.
+
+    python -m benchmarks.suite --json bench/HEAD.json
+    python -m benchmarks.suite --quick --compare bench/HEAD.json
+
+Rows are capped by benchmarks.synthetic.MAX_ROWS (the datetime64[ns] range).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cheap per-city models so forecasting benchmarks do not depend on training candidates
+BENCH_FEATURES = ['retail_sales_lag_1', 'retail_sales_lag_2', 'retail_sales_lag_3', 'non_retail_sales_lag_1',
+                  'primary_price_avg_lag_1', 'price_diff_lag_1', 'retail_sales_roll3', 'non_retail_sales_roll3',
+                  'trend_index']
+TARGETS = ['retail_sales', 'non_retail_sales']
+
+FULL = {'rows': [36, 1000, 6000], 'cities': [4, 50, 200], 'horizons': [1, 3, 6, 12, 24], 'paths': [100, 1000, 5000],
+        'append_rows': [36, 1000, 6000], 'train_rows': [36, 120], 'train_cities': [4], 'repeats': 5}
+QUICK = {'rows': [36, 1000], 'cities': [4, 20], 'horizons': [1, 6, 24], 'paths': [100, 1000],
+         'append_rows': [36, 1000], 'train_rows': [36], 'train_cities': [4], 'repeats': 3}
+
+
+@contextmanager
+def workspace():
+    """Temporary working directory with the data/, models/ and logs/ layout the app expects."""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='sail_bench_') as tmp:
+        for name in ('data', 'models', 'logs'):
+            os.makedirs(os.path.join(tmp, name))
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(previous)
+
+
+def city_name(i):
+    return f"city{i:03d}"
+
+
+def measure(fn, repeats, setup=None):
+    """Median and best wall time of fn() over `repeats` runs; setup() runs untimed before each."""
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {'median_ms': round(statistics.median(timings) * 1000, 3), 'min_ms': round(min(timings) * 1000, 3),
+            'repeats': repeats}
+
+
+def write_city(city, df):
+    from src import storage
+    from src.data_loader import invalidate_city_data
+    from src.utils import atomic_write_bytes
+    atomic_write_bytes(storage.get_storage_path(city), storage.encode_frame(df))
+    invalidate_city_data(city)
+
+
+def fit_bench_models(city, df):
+    """LinearRegression per target on BENCH_FEATURES, saved like train_and_save does (pickle + artifact)."""
+    import hashlib
+    import joblib
+    from sklearn.linear_model import LinearRegression
+    from src.compiled_model import save_artifact, artifact_path
+    from src.utils import get_model_path
+
+    for target in TARGETS:
+        data = df[BENCH_FEATURES + [target]].dropna()
+        model = LinearRegression().fit(data[BENCH_FEATURES], data[target])
+        path = get_model_path(city, target)
+        joblib.dump(model, path)
+        with open(path, 'rb') as f:
+            save_artifact(model, artifact_path(path), hashlib.sha1(f.read()).hexdigest())
+
+
+def prepare_cities(count, rows):
+    """Write `count` synthetic cities with `rows` months each, plus their bench models."""
+    from benchmarks.synthetic import make_city_frame
+    cities = [city_name(i) for i in range(count)]
+    for i, city in enumerate(cities):
+        df = make_city_frame(rows, seed=i)
+        write_city(city, df)
+        fit_bench_models(city, df)
+    return cities
+
+
+def bench_forecast(config):
+    """forecast_next_months per history length and horizon (forecast cache cleared, data/models warm)."""
+    from src.forecast_cache import clear_forecast_cache
+    from src.forecast_utils import forecast_next_months
+
+    results = []
+    for rows in config['rows']:
+        city, = prepare_cities(1, rows)
+        forecast_next_months(city, 'retail_sales', 1)  # warm the dataset and model registries
+        for horizon in config['horizons']:
+            timing = measure(lambda: forecast_next_months(city, 'retail_sales', horizon), config['repeats'],
+                             setup=clear_forecast_cache)
+            results.append({'bench': 'forecast', 'rows': rows, 'horizon': horizon, **timing})
+            print(f"forecast       rows={rows:5d} horizon={horizon:2d}   {timing['median_ms']:9.2f} ms")
+    return results
+
+
+def bench_india(config):
+    """Whole India (total_sales, 6 months) across N regions through the same path as app.forecast."""
+    from src import forecast_service
+    from src.forecast_cache import clear_forecast_cache
+
+    results = []
+    regions = forecast_service.REGIONS
+    try:
+        for count in config['cities']:
+            forecast_service.REGIONS = prepare_cities(count, 36)
+            timing = measure(lambda: forecast_service.run_forecast('india', 'total_sales', 6), config['repeats'],
+                             setup=clear_forecast_cache)
+            results.append({'bench': 'india', 'cities': count, 'horizon': 6, **timing})
+            print(f"india          cities={count:4d}             {timing['median_ms']:9.2f} ms")
+    finally:
+        forecast_service.REGIONS = regions
+    return results
+
+
+def bench_scenarios(config):
+    """forecast_scenarios (total_sales, 24 months) per number of sampled paths."""
+    from src import forecast_service
+    from src.scenario_forecast import forecast_scenarios
+
+    results = []
+    cities = forecast_service.CITIES
+    try:
+        city, = prepare_cities(1, 36)
+        forecast_service.CITIES = cities + [city]
+        forecast_scenarios(city, 'total_sales', 24, paths=1, seed=0)  # warm the dataset and model registries
+        for paths in config['paths']:
+            timing = measure(lambda: forecast_scenarios(city, 'total_sales', 24, paths=paths, seed=0), config['repeats'])
+            results.append({'bench': 'scenarios', 'paths': paths, 'horizon': 24, **timing})
+            print(f"scenarios      paths={paths:5d}            {timing['median_ms']:9.2f} ms")
+    finally:
+        forecast_service.CITIES = cities
+    return results
+
+
+def bench_append(config):
+    """POST /feature_engineer (append one month and recompute derived columns) per history length."""
+    os.environ.setdefault('PRELOAD_MODELS', '0')
+    import app
+
+    client = app.app.test_client()
+    form = {'primary_price_avg': '55000', 'secondary_price_avg': '50000', 'stock_var': '40000',
+            'retail_sales': '15000', 'non_retail_sales': '25000'}
+    results = []
+    for rows in config['append_rows']:
+        from benchmarks.synthetic import make_city_frame
+        city = city_name(0)
+        write_city(city, make_city_frame(rows))
+
+        def append():
+            response = client.post('/feature_engineer', data={'city': city, **form})
+            assert response.status_code == 200 and b'class="error"' not in response.data, "append failed"
+
+        timing = measure(append, config['repeats'])
+        results.append({'bench': 'append', 'rows': rows, **timing})
+        print(f"append         rows={rows:5d}             {timing['median_ms']:9.2f} ms")
+    return results
+
+
+def bench_train(config):
+    """src.batch_train.run_batch_training end to end (feature selection, 4 candidates per job)."""
+    from src.batch_train import run_batch_training
+
+    results = []
+    for rows in config['train_rows']:
+        for count in config['train_cities']:
+            cities = prepare_cities(count, rows)
+            timing = measure(lambda: run_batch_training(cities=cities, targets=TARGETS), 1)
+            results.append({'bench': 'train', 'rows': rows, 'cities': count, **timing})
+            print(f"train          rows={rows:5d} cities={count:4d} {timing['median_ms']:9.2f} ms")
+    return results
+
+
+BENCHES = {'forecast': bench_forecast, 'india': bench_india, 'scenarios': bench_scenarios, 'append': bench_append, 'train': bench_train}
+
+
+def run_metadata():
+    import numpy
+    import pandas
+    import sklearn
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'pandas': pandas.__version__, 'numpy': numpy.__version__, 'sklearn': sklearn.__version__,
+            'cpu_count': os.cpu_count()}
+
+
+def result_key(result):
+    return tuple(sorted((k, v) for k, v in result.items() if k not in ('median_ms', 'min_ms', 'repeats')))
+
+
+def compare(results, baseline_path):
+    """Print each result's median against the same benchmark in an earlier --json report."""
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    print(f"\nvs {baseline_path}:")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        ratio = old['median_ms'] / result['median_ms'] if result['median_ms'] else float('inf')
+        label = ' '.join(f"{k}={v}" for k, v in result_key(result))
+        print(f"  {label:<45} {old['median_ms']:9.2f} -> {result['median_ms']:9.2f} ms  ({ratio:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=list(BENCHES), default=list(BENCHES))
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes for a fast check")
+    parser.add_argument('--rows', type=int, nargs='+')
+    parser.add_argument('--cities', type=int, nargs='+')
+    parser.add_argument('--horizons', type=int, nargs='+')
+    parser.add_argument('--paths', type=int, nargs='+')
+    parser.add_argument('--repeats', type=int)
+    parser.add_argument('--json', help="Write results to this file")
+    parser.add_argument('--compare', help="Earlier --json report to compare against")
+    args = parser.parse_args()
+
+    config = dict(QUICK if args.quick else FULL)
+    for name in ('rows', 'cities', 'horizons', 'paths', 'repeats'):
+        if getattr(args, name) is not None:
+            config[name] = getattr(args, name)
+    if args.rows:
+        config['append_rows'] = args.rows
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    # src modules resolve data/, models/ and logs/ against the working directory, so they are
+    # imported only after switching to the workspace
+    with workspace():
+        results = []
+        for name in args.only:
+            results += BENCHES[name](config)
+        from src.metrics import get_stage_summary
+        report = {'meta': run_metadata(), 'config': config, 'results': results, 'stages': get_stage_summary()}
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if compare_path:
+        compare(results, compare_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from src.feature_updater import engineer_features
+
+# pandas stores dates as datetime64[ns], which only spans 1677-2262; keep three years spare
+# after the last row for forecast horizons and appended months
+EARLIEST_START = pd.Timestamp('1678-01-01')
+LATEST_END = pd.Timestamp('2025-06-01')
+MAX_ROWS = (pd.Timestamp.max.year - EARLIEST_START.year) * 12 - 36
+
+
+def make_city_frame(rows, seed=0, end=LATEST_END):
+    """
+    Synthetic monthly history shaped like data/{city}_pr.csv: trending prices and stock,
+    seasonal sales, and every derived column from engineer_features.
+    Args:
+        rows (int): Number of months
+        seed (int): RNG seed, so every run of a benchmark sees the same data
+        end (pd.Timestamp): Date of the last row (moved later if `rows` would start before 1678)
+    Raises:
+        ValueError: rows > MAX_ROWS
+    Returns:
+        pd.DataFrame: One row per month with a datetime 'date' column
+    """
+    if rows > MAX_ROWS:
+        raise ValueError(f"At most {MAX_ROWS} monthly rows fit in datetime64[ns]; got {rows}.")
+    rng = np.random.default_rng(seed)
+    end = max(pd.Timestamp(end), EARLIEST_START + pd.DateOffset(months=rows - 1))
+    dates = pd.date_range(end=end, periods=rows, freq='MS')
+    t = np.arange(rows)
+    season = np.sin(2 * np.pi * dates.month / 12)
+
+    df = pd.DataFrame({
+        'date': dates,
+        'primary_price_avg': np.round(55000 + 10 * t + rng.normal(0, 800, rows).cumsum() * 0.1, 2),
+        'secondary_price_avg': np.round(50000 + 8 * t + rng.normal(0, 700, rows).cumsum() * 0.1, 2),
+        'stock_var': np.round(40000 + rng.normal(0, 6000, rows)),
+        'retail_sales': np.round(15000 + 3000 * season + rng.normal(0, 1500, rows), 2),
+        'non_retail_sales': np.round(25000 + 5000 * season + rng.normal(0, 2500, rows), 2),
+    })
+    return engineer_features(df)
@@ -1,31 +1,162 @@
-import pandas as pd
+import os
 import json
-from src.model_trainer import train_and_save
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.data_loader import load_city_data, get_data_version
+from src.model_trainer import train_and_save, update_and_save
+from src.utils import atomic_write_json, get_model_path
 
 CITIES = ['mumbai', 'delhi', 'chennai', 'durgapur']
 TARGETS = ['retail_sales', 'non_retail_sales']
 FEATURE_JSON_PATH = 'models/feature_sets.json'
+TRAINING_REPORT_PATH = 'models/training_report.json'
+# Per city/target: data hash, row counts, features and params of the last training run
+TRAINING_STATE_PATH = 'models/training_state.json'
 
-feature_sets = {}
+# Parallel city/target jobs, and n_jobs handed to each job's feature-selection forest and model search pool
+TRAIN_WORKERS = int(os.environ.get('TRAIN_WORKERS', os.cpu_count() or 1))
+MODEL_N_JOBS = int(os.environ.get('MODEL_N_JOBS', 1))
+# Incremental runs redo feature selection and the model search once this many months were
+# appended since the last full run
+FULL_RETRAIN_MONTHS = int(os.environ.get('FULL_RETRAIN_MONTHS', 12))
 
-for city in CITIES:
-    # Load the feature-engineered CSV
-    file_path = f"data/{city}_pr.csv"
-    df = pd.read_csv(file_path, parse_dates=['date'], dayfirst=True)
 
-    for target in TARGETS:
-        print(f"\n🔧 Training model for {city.title()} - {target}...")
-        model_path, model_name, metrics, top_features = train_and_save(city, df, target)
+def _read_json(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
 
-        # Store results in dictionary
-        feature_sets[f"{city}_{target}"] = {
-            "model": model_name,
-            "R2": round(metrics['R2'], 4),
-            "features": top_features
-        }
 
-# ✅ Save all feature sets to JSON
-with open(FEATURE_JSON_PATH, "w") as f:
-    json.dump(feature_sets, f, indent=4)
+def _rounded(value):
+    """Round for the JSON report; NaN (e.g. R2 over a single new month) becomes null."""
+    return round(value, 4) if math.isfinite(value) else None
 
-print(f"\n✅ All models trained. Feature sets saved to {FEATURE_JSON_PATH}")
+
+def train_job(city, target, model_n_jobs=MODEL_N_JOBS, previous=None):
+    """
+    Train one city/target pair. Runs in a worker process and never touches the feature JSON.
+    Args:
+        previous (dict): Its TRAINING_STATE_PATH entry; when given (and fewer than FULL_RETRAIN_MONTHS
+            months were added since the last full run) the saved model is updated incrementally
+    """
+    start = time.perf_counter()
+    # Hash before reading: if the file changes in between, the next incremental run retrains again
+    data_version = get_data_version(city)
+    df = load_city_data(city)
+    rows = len(df)
+
+    if previous is not None and rows - previous['searched_rows'] < FULL_RETRAIN_MONTHS:
+        model_path, model_name, metrics, top_features = update_and_save(
+            city, df, target, previous['features'], new_rows=rows - previous['rows']
+        )
+        mode, searched_rows = 'incremental', previous['searched_rows']
+    else:
+        model_path, model_name, metrics, top_features = train_and_save(
+            city, df, target, n_jobs=model_n_jobs, save_feature_sets=False
+        )
+        mode, searched_rows = 'full', rows
+
+    return {
+        "city": city,
+        "target": target,
+        "model": model_name,
+        "mode": mode,
+        "R2": _rounded(metrics['R2']),
+        "RMSE": _rounded(metrics['RMSE']),
+        "params": metrics['params'],
+        "features": top_features,
+        "data_version": data_version,
+        "rows": rows,
+        "searched_rows": searched_rows,
+        "ranking_seconds": metrics.get('ranking_seconds', 0.0),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _changed_jobs(jobs, state):
+    """Jobs whose city data changed since their last run, each with its previous state (None = train from scratch)."""
+    versions = {}
+    pending = []
+    for city, target in jobs:
+        previous = state.get(f"{city}_{target}")
+        if previous is None or not os.path.exists(get_model_path(city, target)):
+            pending.append((city, target, None))
+            continue
+        if city not in versions:
+            versions[city] = get_data_version(city)
+        if previous['data_version'] != versions[city]:
+            pending.append((city, target, previous))
+    return pending
+
+
+def run_batch_training(cities=CITIES, targets=TARGETS, max_workers=TRAIN_WORKERS, model_n_jobs=MODEL_N_JOBS,
+                       incremental=False):
+    """
+    Train every city x target pair across a process pool, then merge all feature sets
+    into FEATURE_JSON_PATH in one atomic write.
+    Args:
+        incremental (bool): Only retrain pairs whose city data changed since TRAINING_STATE_PATH was
+            written, reusing their features and warm-starting the saved models
+    Returns:
+        list: One result dict per successful job, in city/target order
+    """
+    jobs = [(city, target) for city in cities for target in targets]
+    state = _read_json(TRAINING_STATE_PATH)
+    if incremental:
+        pending = _changed_jobs(jobs, state)
+        print(f"🔎 {len(pending)} of {len(jobs)} city/target pairs changed since the last training run")
+    else:
+        pending = [(city, target, None) for city, target in jobs]
+
+    results = {}
+    start = time.perf_counter()
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(train_job, city, target, model_n_jobs, previous): (city, target)
+                       for city, target, previous in pending}
+            for future in as_completed(futures):
+                city, target = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Training failed for {city.title()} - {target}: {e}")
+                    continue
+                results[(city, target)] = result
+                print(f"🔧 {city.title()} - {target}: {result['model']} ({result['mode']}, R2={result['R2']}) "
+                      f"in {result['seconds']:.1f}s")
+
+    ordered = [results[job] for job in jobs if job in results]
+    pending_keys = {(city, target) for city, target, _ in pending}
+
+    feature_sets = _read_json(FEATURE_JSON_PATH)
+    for result in ordered:
+        key = f"{result['city']}_{result['target']}"
+        feature_sets[key] = result['features']
+        state[key] = {k: result[k] for k in ('data_version', 'rows', 'searched_rows', 'features', 'model', 'params')}
+        state[key]['trained_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    atomic_write_json(FEATURE_JSON_PATH, feature_sets)
+    atomic_write_json(TRAINING_STATE_PATH, state)
+
+    atomic_write_json(TRAINING_REPORT_PATH, {
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "incremental": incremental,
+        "skipped": [f"{city}_{target}" for city, target in jobs if (city, target) not in pending_keys],
+        "jobs": [{k: v for k, v in r.items() if k != 'features'} for r in ordered],
+    })
+    return ordered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train every city/target model in parallel.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only update models whose city data changed since the last run")
+    parser.add_argument('--cities', nargs='+', default=CITIES)
+    parser.add_argument('--targets', nargs='+', default=TARGETS)
+    args = parser.parse_args()
+
+    results = run_batch_training(args.cities, args.targets, incremental=args.incremental)
+    print(f"\n✅ Trained {len(results)} models. Feature sets saved to {FEATURE_JSON_PATH}")
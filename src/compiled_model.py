@@ -0,0 +1,236 @@
+"""
+Compact inference artifacts for trained models (models/{city}_{target}.npz).
+
+compile_model() flattens a fitted LinearRegression, RandomForestRegressor or
+GradientBoostingRegressor into plain NumPy arrays; CompiledModel evaluates them with
+NumPy only, so serving needs neither the pickled estimator nor sklearn's input validation.
+"""
+import io
+import os
+import numpy as np
+
+ARTIFACT_EXTENSION = '.npz'
+
+
+def _flatten_trees(trees):
+    """Concatenate sklearn tree_ arrays, offsetting child indices so every tree shares one node table."""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        leaf = t.children_left == -1
+        feature.append(np.where(leaf, 0, t.feature))
+        threshold.append(t.threshold)
+        left.append(np.where(leaf, -1, t.children_left + offset))
+        right.append(np.where(leaf, -1, t.children_right + offset))
+        value.append(t.value[:, 0, 0])
+        roots.append(offset)
+        offset += t.node_count
+    return {
+        'feature': np.concatenate(feature).astype(np.int64),
+        'threshold': np.concatenate(threshold),
+        'left': np.concatenate(left).astype(np.int64),
+        'right': np.concatenate(right).astype(np.int64),
+        'value': np.concatenate(value),
+        'roots': np.array(roots, dtype=np.int64),
+    }
+
+
+def compile_model(model):
+    """
+    Flatten a fitted estimator into NumPy arrays.
+    Returns:
+        dict: Arrays for CompiledModel, or None if the estimator type is not supported
+    """
+    kind = type(model).__name__
+    arrays = {'feature_names': np.array(getattr(model, 'feature_names_in_', []), dtype=str)}
+
+    if kind == 'LinearRegression':
+        arrays['coef'] = np.asarray(model.coef_, dtype=float).ravel()
+        arrays['intercept'] = np.asarray(model.intercept_, dtype=float).reshape(1)
+    elif kind == 'RandomForestRegressor':
+        arrays.update(_flatten_trees(model.estimators_))
+    elif kind == 'GradientBoostingRegressor':
+        if getattr(model, 'loss', 'squared_error') != 'squared_error':
+            return None
+        if model.init_ == 'zero':
+            init = 0.0
+        elif hasattr(model.init_, 'constant_'):
+            init = float(np.ravel(model.init_.constant_)[0])
+        else:
+            return None
+        arrays.update(_flatten_trees(model.estimators_[:, 0]))
+        arrays['init'] = np.array([init])
+        arrays['learning_rate'] = np.array([model.learning_rate])
+    else:
+        return None
+
+    arrays['kind'] = np.array(kind)
+    return arrays
+
+
+def save_artifact(model, path, source_version=''):
+    """
+    Write the compiled form of `model` to `path` (.npz).
+    Args:
+        source_version (str): Content hash of the pickle it was compiled from, checked on load
+    Returns:
+        bool: False if the estimator type is not supported (nothing is written)
+    """
+    arrays = compile_model(model)
+    if arrays is None:
+        return False
+    arrays['source_version'] = np.array(source_version)
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    # Imported here so inference-only processes do not pull in the utils dependencies
+    from src.utils import atomic_write_bytes
+    atomic_write_bytes(path, buf.getvalue())
+    return True
+
+
+def artifact_path(model_path):
+    return os.path.splitext(model_path)[0] + ARTIFACT_EXTENSION
+
+
+class CompiledModel:
+    """NumPy-only stand-in for a fitted estimator: feature_names_in_ and predict(X)."""
+
+    def __init__(self, arrays):
+        self.kind = str(arrays['kind'])
+        self.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object)
+        self.source_version = str(arrays.get('source_version', ''))
+        self._arrays = {k: np.asarray(v) for k, v in arrays.items()}
+        if 'value' in self._arrays:
+            # Depth bound for the vectorized walk: no path is longer than the node count
+            self._max_steps = len(self._arrays['value'])
+
+    @classmethod
+    def load(cls, source):
+        """Read an artifact from a path or bytes."""
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with np.load(source, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    @property
+    def group_key(self):
+        """Models with equal keys can be evaluated together by predict_many."""
+        a = self._arrays
+        return (self.kind, len(self.feature_names_in_), len(a['roots']) if 'roots' in a else 0)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[None, :]
+        a = self._arrays
+        if self.kind == 'LinearRegression':
+            return _linear(X, a['coef'], a['intercept'][0])
+        if self.kind == 'RandomForestRegressor':
+            return _tree_sum(X, a, a['roots'], self._max_steps) / len(a['roots'])
+        if self.kind == 'GradientBoostingRegressor':
+            return a['init'][0] + a['learning_rate'][0] * _tree_sum(X, a, a['roots'], self._max_steps)
+        raise ValueError(f"Unsupported compiled model kind '{self.kind}'.")
+
+
+def _linear(X, coef, intercept):
+    """Row-wise dot product; coef and intercept may be per model or per row."""
+    return (X * coef).sum(axis=1) + intercept
+
+
+def _tree_sum(X, nodes, roots, max_steps):
+    """
+    Sum over trees of each row's leaf value. X is compared as float32, as sklearn trees do.
+    Args:
+        nodes (dict): feature, threshold, left, right and value arrays of a shared node table
+        roots (np.ndarray): Root node of every tree, shared by all rows (1-D) or per row (2-D)
+        max_steps (int): Upper bound on path length
+    """
+    X = X.astype(np.float32).astype(np.float64)
+    rows = np.arange(len(X))[:, None]
+    node = np.broadcast_to(roots, (len(X), roots.shape[-1])).copy()
+    for _ in range(max_steps):
+        left = nodes['left'][node]
+        active = left != -1
+        if not active.any():
+            break
+        go_left = X[rows, nodes['feature'][node]] <= nodes['threshold'][node]
+        node = np.where(active, np.where(go_left, left, nodes['right'][node]), node)
+    return nodes['value'][node].sum(axis=1)
+
+
+def _predict_group(models, matrices):
+    """One vectorized evaluation of same-shaped CompiledModels, each row using its own model's arrays."""
+    counts = [len(X) for X in matrices]
+    X = np.concatenate(matrices)
+    arrays = [m._arrays for m in models]
+    kind = models[0].kind
+
+    if kind == 'LinearRegression':
+        coef = np.repeat(np.stack([a['coef'] for a in arrays]), counts, axis=0)
+        intercept = np.repeat([a['intercept'][0] for a in arrays], counts)
+        return _linear(X, coef, intercept)
+
+    # Stack the node tables; every row starts from its own model's roots
+    offsets = np.cumsum([0] + [len(a['value']) for a in arrays[:-1]])
+    nodes = {
+        'feature': np.concatenate([a['feature'] for a in arrays]),
+        'threshold': np.concatenate([a['threshold'] for a in arrays]),
+        'left': np.concatenate([np.where(a['left'] == -1, -1, a['left'] + off) for a, off in zip(arrays, offsets)]),
+        'right': np.concatenate([np.where(a['right'] == -1, -1, a['right'] + off) for a, off in zip(arrays, offsets)]),
+        'value': np.concatenate([a['value'] for a in arrays]),
+    }
+    roots = np.repeat(np.stack([a['roots'] + off for a, off in zip(arrays, offsets)]), counts, axis=0)
+    sums = _tree_sum(X, nodes, roots, max(m._max_steps for m in models))
+    if kind == 'RandomForestRegressor':
+        return sums / roots.shape[1]
+    init = np.repeat([a['init'][0] for a in arrays], counts)
+    learning_rate = np.repeat([a['learning_rate'][0] for a in arrays], counts)
+    return init + learning_rate * sums
+
+
+def predict_many(models, matrices):
+    """
+    Predict with many models at once. CompiledModels sharing a group_key are evaluated in one
+    vectorized pass (bit-identical to calling each one's predict); anything else predicts alone.
+    Args:
+        models (list): Fitted estimators or CompiledModels
+        matrices (list): Input for each model, columns in its feature_names_in_ order
+    Returns:
+        list: Prediction array per model
+    """
+    results = [None] * len(models)
+    groups = {}
+    for i, (model, X) in enumerate(zip(models, matrices)):
+        if isinstance(model, CompiledModel) and len(X):
+            groups.setdefault(model.group_key, []).append(i)
+        else:
+            results[i] = model.predict(X)
+
+    for members in groups.values():
+        group_models = [models[i] for i in members]
+        group_matrices = [np.asarray(matrices[i], dtype=float) for i in members]
+        predictions = _predict_group(group_models, group_matrices)
+        bounds = np.cumsum([0] + [len(X) for X in group_matrices])
+        for i, lo, hi in zip(members, bounds[:-1], bounds[1:]):
+            results[i] = predictions[lo:hi]
+    return results
+
+
+if __name__ == "__main__":
+    # Compile every pickled model in models/ (e.g. models trained before artifacts existed)
+    import hashlib
+    import joblib
+    from src.model_loader import MODEL_DIR
+
+    for filename in sorted(os.listdir(MODEL_DIR)):
+        if not filename.endswith('.pkl'):
+            continue
+        path = os.path.join(MODEL_DIR, filename)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        model = joblib.load(io.BytesIO(raw))
+        if save_artifact(model, artifact_path(path), hashlib.sha1(raw).hexdigest()):
+            print(f"✅ Compiled {filename} ({type(model).__name__})")
+        else:
+            print(f"⚠️ Skipped {filename}: {type(model).__name__} has no compiled form")
@@ -1,4 +1,14 @@
-import pandas as pd
+import hashlib
+import os
+import threading
+from src.storage import parse_csv, get_storage_path, decode_frame
+from src.metrics import timer
+
+# city -> {'df': parsed DataFrame, 'stamp': (mtime_ns, size), 'version': sha1 of the file}
+_datasets = {}
+_datasets_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
 
 def load_csv(filepath):
     """
@@ -8,8 +18,8 @@ def load_csv(filepath):
     Returns:
         pd.DataFrame: Loaded DataFrame
     """
-    df = pd.read_csv(filepath, parse_dates=['date'], dayfirst=True)
-    return df
+    return parse_csv(filepath)
+
 
 def clean_data(df):
     """
@@ -22,3 +32,90 @@ def clean_data(df):
     df = df.dropna()
     df = df.sort_values('date')
     return df
+
+
+def get_city_data_path(city):
+    """Path of the city dataset in the configured storage backend (data/{city}_pr.csv by default)."""
+    return get_storage_path(city)
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _get_cached(city):
+    path = get_city_data_path(city)
+    stamp = _file_stamp(path)
+
+    with _datasets_lock:
+        entry = _datasets.get(city)
+        if entry is not None and entry['stamp'] == stamp:
+            _stats['hits'] += 1
+            return entry
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    with timer('parse_dataset', city=city):
+        df = decode_frame(raw)
+    entry = {'df': df, 'stamp': stamp, 'version': hashlib.sha1(raw).hexdigest()}
+    with _datasets_lock:
+        _stats['misses'] += 1
+        _datasets[city] = entry
+    return entry
+
+
+def load_city_data(city, copy=True):
+    """
+    Return the parsed city dataset, decoding the file only when it changed on disk.
+    Args:
+        city (str): City name, e.g. 'mumbai'
+        copy (bool): False returns the cached frame itself, for read-only callers
+    Returns:
+        pd.DataFrame: A private copy the caller is free to modify (unless copy=False)
+    """
+    df = _get_cached(city)['df']
+    return df.copy() if copy else df
+
+
+def get_last_date(city):
+    """Latest date in the city dataset, read from the cache without copying it."""
+    return _get_cached(city)['df']['date'].max()
+
+
+def get_data_version(city):
+    """Content hash of the city dataset file, used to key anything derived from it."""
+    return _get_cached(city)['version']
+
+
+def put_city_data(city, df, raw):
+    """
+    Replace the cached dataset after a write, so the writer does not re-parse its own file.
+    Args:
+        city (str): City name
+        df (pd.DataFrame): Parsed frame matching what decode_frame would return for `raw`
+        raw (bytes): Exact bytes just written to the city dataset file
+    """
+    entry = {
+        'df': df.copy(),
+        'stamp': _file_stamp(get_city_data_path(city)),
+        'version': hashlib.sha1(raw).hexdigest(),
+    }
+    with _datasets_lock:
+        _datasets[city] = entry
+
+
+def invalidate_city_data(city=None):
+    """Drop the cached copy of one city (or all cities) so the next read re-parses it."""
+    with _datasets_lock:
+        if city is None:
+            _datasets.clear()
+        else:
+            _datasets.pop(city, None)
+
+
+def get_dataset_stats():
+    with _datasets_lock:
+        stats = dict(_stats)
+        stats['cached'] = sorted(_datasets)
+    return stats
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+from src.feature_spec import TRAILING_FEATURES, TRAILING_CUSTOM_AVG_FALLBACK, compute_features, frame_buffers, spec_sources
 
 def generate_features_for_month(df):
     last_date = df['date'].max()
@@ -19,34 +21,23 @@ def generate_features_for_month(df):
     df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
     df = df.sort_values('date').reset_index(drop=True)
 
-    # Lag and rolling features
-    df['retail_sales_lag_1'] = df['retail_sales'].shift(1)
-    df['retail_sales_lag_2'] = df['retail_sales'].shift(2)
-    df['retail_sales_lag_3'] = df['retail_sales'].shift(3)
-    df['retail_sales_roll3'] = df['retail_sales'].rolling(3).mean()
+    # Lag, rolling and custom-average features (see TRAILING_FEATURES)
+    buffers = frame_buffers(df, spec_sources(TRAILING_FEATURES))
+    positions = np.arange(len(df))
+    for name, values in compute_features(TRAILING_FEATURES, buffers, df['date'], positions).items():
+        df[name] = values
 
-    df['non_retail_sales_lag_1'] = df['non_retail_sales'].shift(1)
-    df['non_retail_sales_lag_2'] = df['non_retail_sales'].shift(2)
-    df['non_retail_sales_lag_3'] = df['non_retail_sales'].shift(3)
-    df['non_retail_sales_roll3'] = df['non_retail_sales'].rolling(3).mean()
-
-    df['price_diff_lag_1'] = df['price_diff'].shift(1)
-    df['price_diff_lag_2'] = df['price_diff'].shift(2)
-    df['price_diff_lag_3'] = df['price_diff'].shift(3)
-
-    # Custom average (with fallback)
-    df['non_retail_sales_custom_avg'] = df['non_retail_sales'].rolling(3, center=True).mean()
+    # Custom average fallback when the newest row's centered window is incomplete
     if pd.isna(df['non_retail_sales_custom_avg'].iloc[-1]):
-        df.at[df.index[-1], 'non_retail_sales_custom_avg'] = df['non_retail_sales'].iloc[-4:-1].mean()
+        fallback = compute_features(TRAILING_CUSTOM_AVG_FALLBACK, buffers, df['date'], positions[-1:])
+        df.at[df.index[-1], 'non_retail_sales_custom_avg'] = fallback['non_retail_sales_custom_avg'][0]
 
     # Separate future row and clean historical data
     historical_df = df.iloc[:-1].dropna()
     future_row = df.iloc[[-1]].copy()
 
     # Fill any remaining NaNs in future row with ffill/bfill or 0
-    future_row.fillna(method='ffill', inplace=True)
-    future_row.fillna(method='bfill', inplace=True)
-    future_row.fillna(0, inplace=True)
+    future_row = future_row.ffill().bfill().fillna(0)
 
     # Combine back together
     df_cleaned = pd.concat([historical_df, future_row], ignore_index=True)
@@ -1,22 +1,158 @@
+import os
+import json
+import time
+import hashlib
+import threading
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
+from src.logger import get_logger
+from src.metrics import timer
+from src.utils import atomic_write_json
+
+logger = get_logger(__name__)
+
+# 'forest' (default), 'correlation', 'mutual_info' or 'permutation'
+FEATURE_RANKER = os.environ.get('FEATURE_RANKER', 'forest')
+# Rankings are memoized per (dataset hash, target, ranker) in memory and under this directory
+RANKING_CACHE_DIR = os.environ.get('RANKING_CACHE_DIR', os.path.join('models', 'feature_rankings'))
+# Rows scored by the 'permutation' ranker
+PERMUTATION_SAMPLE = int(os.environ.get('PERMUTATION_SAMPLE', 200))
+
+EXCLUDED_FEATURES = ['total_sales']
+
+_rankings = {}
+_rankings_lock = threading.Lock()
+
+
+def _rank_forest(X, y, n_jobs):
+    from sklearn.ensemble import RandomForestRegressor
+    model = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    model.fit(X, y)
+    return model.feature_importances_
+
+
+def _rank_correlation(X, y, n_jobs):
+    return X.corrwith(y).abs().fillna(0.0).to_numpy()
+
+
+def _rank_mutual_info(X, y, n_jobs):
+    from sklearn.feature_selection import mutual_info_regression
+    return mutual_info_regression(X.fillna(X.median()).fillna(0.0), y, random_state=42)
+
+
+def _rank_permutation(X, y, n_jobs):
+    """Drop in score when each column is shuffled, measured on up to PERMUTATION_SAMPLE rows."""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.inspection import permutation_importance
+    model = RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=n_jobs).fit(X, y)
+    sample = X.sample(min(len(X), PERMUTATION_SAMPLE), random_state=42)
+    result = permutation_importance(model, sample, y.loc[sample.index], n_repeats=5, random_state=42, n_jobs=n_jobs)
+    return result.importances_mean
+
+
+RANKERS = {
+    'forest': _rank_forest,
+    'correlation': _rank_correlation,
+    'mutual_info': _rank_mutual_info,
+    'permutation': _rank_permutation,
+}
+
+
+def _dataset_hash(X, y):
+    digest = hashlib.sha1()
+    digest.update(','.join(X.columns).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    version, target, ranker = key
+    return os.path.join(RANKING_CACHE_DIR, f"{target}_{ranker}_{version}.json")
+
+
+def _load_ranking(key):
+    with _rankings_lock:
+        entry = _rankings.get(key)
+    if entry is not None:
+        return entry
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable feature ranking %s: %s", path, e)
+        return None
+    with _rankings_lock:
+        _rankings[key] = entry
+    return entry
+
+
+def _store_ranking(key, entry):
+    with _rankings_lock:
+        _rankings[key] = entry
+    try:
+        atomic_write_json(_cache_path(key), entry)
+    except OSError as e:
+        logger.warning("Could not cache feature ranking for %s: %s", key, e)
+
+
+def rank_features(df, target, ranker=None, n_jobs=None):
+    """
+    Importance of every numeric column for predicting `target`, memoized by dataset content.
+    Args:
+        df (pd.DataFrame): City dataset
+        target (str): Target column
+        ranker (str): Key of RANKERS; defaults to FEATURE_RANKER
+        n_jobs (int): Parallelism for the forest-based rankers
+    Returns:
+        pd.DataFrame: feature, importance (highest first); attrs hold 'seconds' spent in this call
+            and whether the ranking was 'cached'
+    """
+    ranker = ranker or FEATURE_RANKER
+    if ranker not in RANKERS:
+        raise ValueError(f"Unknown feature ranker '{ranker}'. Choose from {list(RANKERS)}.")
 
-def select_top_features(df, target, n=10):
     # Only keep numeric columns and drop target and date/time
     numeric_df = df.select_dtypes(include='number')
     X = numeric_df.drop(columns=[target], errors='ignore')
     y = df[target]
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
+    start = time.perf_counter()
+    key = (_dataset_hash(X, y), target, ranker)
+    entry = _load_ranking(key)
+    cached = entry is not None
+    if not cached:
+        with timer('rank_features', ranker=ranker):
+            importances = RANKERS[ranker](X, y, n_jobs)
+        entry = {'features': list(X.columns), 'importances': [float(v) for v in importances],
+                 'seconds': round(time.perf_counter() - start, 4)}
+        _store_ranking(key, entry)
+        logger.info("Ranked %d features for %s with %s in %.2fs", X.shape[1], target, ranker, entry['seconds'])
+    else:
+        logger.debug("Reusing %s feature ranking for %s", ranker, target)
 
     feature_importances = pd.DataFrame({
-        'feature': X.columns,
-        'importance': model.feature_importances_
+        'feature': entry['features'],
+        'importance': entry['importances']
     }).sort_values(by='importance', ascending=False)
+    feature_importances.attrs['seconds'] = round(time.perf_counter() - start, 4)
+    feature_importances.attrs['cached'] = cached
+    return feature_importances
+
+
+def select_top_features(df, target, n=10, n_jobs=None, ranker=None):
+    feature_importances = rank_features(df, target, ranker=ranker, n_jobs=n_jobs)
 
     # Drop unwanted features manually
-    feature_importances = feature_importances[~feature_importances['feature'].isin(['total_sales'])]
+    feature_importances = feature_importances[~feature_importances['feature'].isin(EXCLUDED_FEATURES)]
 
     top_features = feature_importances.head(n)['feature'].tolist()
     return top_features, feature_importances
+
+
+def clear_ranking_cache():
+    """Forget in-memory rankings (files under RANKING_CACHE_DIR are kept)."""
+    with _rankings_lock:
+        _rankings.clear()
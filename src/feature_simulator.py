@@ -1,43 +1,195 @@
-import pandas as pd
+import logging
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from src.logger import get_logger
+from src.metrics import timer
 
-logger = get_logger()
+logger = get_logger(__name__)
 
-def simulate_future_inputs(df, months):
-    logger.info("Simulating future values using linear trend...")
-    logger.info(f"Simulating future inputs... df shape: {df.shape}, months: {months}")
+EXOGENOUS_COLUMNS = ['primary_price_avg', 'secondary_price_avg', 'stock_var']
 
-    df = df.copy()
-    df = df.sort_values("date")
+# Simulator used when a forecast does not ask for one: 'linear', 'damped' or 'seasonal_naive'
+DEFAULT_SIMULATOR = os.environ.get('TREND_SIMULATOR', 'linear')
+# Per-month damping of the slope for the 'damped' simulator (1.0 = plain linear trend)
+DAMPING_FACTOR = float(os.environ.get('TREND_DAMPING', 0.9))
+SEASON_LENGTH = 12
 
-    required_cols = ['primary_price_avg', 'secondary_price_avg', 'stock_var']
-    for col in required_cols:
+FIT_CACHE_SIZE = 64
+
+# (data_version, simulator) -> fitted state
+_fits = OrderedDict()
+_fits_lock = threading.Lock()
+
+
+def _fit_linear(history):
+    """
+    Least-squares line through every column at once: one solve over the shared design
+    matrix [1, t] (t centered, as sklearn's LinearRegression does).
+    Returns:
+        dict: intercept and slope arrays (one entry per column) and the history length
+    """
+    n = len(history)
+    t = np.arange(n, dtype=float)
+    t_mean = t.mean()
+    y_mean = history.mean(axis=0)
+    design = (t - t_mean)[:, None]
+    slope = np.linalg.lstsq(design, history - y_mean, rcond=None)[0][0]
+    return {'intercept': y_mean - slope * t_mean, 'slope': slope, 'n': n}
+
+
+def _project_linear(fit, months):
+    future_t = np.arange(fit['n'], fit['n'] + months, dtype=float)
+    return fit['intercept'] + future_t[:, None] * fit['slope']
+
+
+def _project_damped(fit, months):
+    """Linear fit level at the last observed month, with the slope decaying by DAMPING_FACTOR per month."""
+    level = fit['intercept'] + (fit['n'] - 1) * fit['slope']
+    steps = np.cumsum(DAMPING_FACTOR ** np.arange(1, months + 1))
+    return level + steps[:, None] * fit['slope']
+
+
+def _fit_seasonal_naive(history):
+    """Last full season of observations (fewer if the history is shorter)."""
+    return {'season': history[-SEASON_LENGTH:].copy()}
+
+
+def _project_seasonal_naive(fit, months):
+    season = fit['season']
+    return season[np.arange(months) % len(season)]
+
+
+SIMULATORS = {
+    'linear': (_fit_linear, _project_linear),
+    'damped': (_fit_linear, _project_damped),
+    'seasonal_naive': (_fit_seasonal_naive, _project_seasonal_naive),
+}
+
+
+def _residuals_linear(history):
+    """Deviations of each month from the fitted line."""
+    fit = _fit_linear(history)
+    t = np.arange(len(history), dtype=float)
+    return history - (fit['intercept'] + t[:, None] * fit['slope'])
+
+
+def _residuals_seasonal_naive(history):
+    """Year-over-year changes (deviations from the linear fit when there is no full year before)."""
+    if len(history) <= SEASON_LENGTH:
+        return _residuals_linear(history)
+    return history[SEASON_LENGTH:] - history[:-SEASON_LENGTH]
+
+
+# Month-level noise each simulator's projection is bootstrapped with by simulate_input_paths
+RESIDUALS = {
+    'linear': _residuals_linear,
+    'damped': _residuals_linear,
+    'seasonal_naive': _residuals_seasonal_naive,
+}
+
+
+def _simulator(name):
+    name = name or DEFAULT_SIMULATOR
+    if name not in SIMULATORS:
+        raise ValueError(f"Unknown simulator '{name}'. Choose from {list(SIMULATORS)}.")
+    return name, SIMULATORS[name]
+
+
+def _get_fit(history, name, fit_fn, version):
+    if version is None:
+        return fit_fn(history)
+    key = (version, name)
+    with _fits_lock:
+        fit = _fits.get(key)
+        if fit is not None:
+            _fits.move_to_end(key)
+            return fit
+    fit = fit_fn(history)
+    with _fits_lock:
+        _fits[key] = fit
+        while len(_fits) > FIT_CACHE_SIZE:
+            _fits.popitem(last=False)
+    return fit
+
+
+@timer('simulate_inputs')
+def simulate_future_inputs(df, months, simulator=None, version=None):
+    """
+    Project primary/secondary price and stock_var over the forecast horizon.
+    Args:
+        df (pd.DataFrame): City history with a date column and EXOGENOUS_COLUMNS
+        months (int): Months to simulate
+        simulator (str): Key of SIMULATORS; defaults to DEFAULT_SIMULATOR
+        version (str): Dataset version (see data_loader.get_data_version); fits are cached per version
+    Returns:
+        tuple: (primary, secondary, stock_var) arrays of length `months`, or (None, None, None)
+    """
+    name, (fit_fn, project_fn) = _simulator(simulator)
+    logger.debug("Simulating %d months of future inputs (%s) from %d rows", months, name, len(df))
+
+    for col in EXOGENOUS_COLUMNS:
         if col not in df.columns or df[col].isnull().any():
-            logger.error(f"Missing or invalid values in required column: {col}")
+            logger.error("Missing or invalid values in required column: %s", col)
             return None, None, None
 
-    # Create a time index (0, 1, 2, ..., n-1)
-    df['time_index'] = np.arange(len(df))
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date')
+    history = df[EXOGENOUS_COLUMNS].to_numpy(dtype=float)
+
+    fit = _get_fit(history, name, fit_fn, version)
+    projected = project_fn(fit, months)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Simulated inputs (%s): %s", name, dict(zip(EXOGENOUS_COLUMNS, projected.T.tolist())))
+
+    return projected[:, 0], projected[:, 1], projected[:, 2]
+
 
-    trends = {}
-    for col in required_cols:
-        X = df[['time_index']]
-        y = df[col].values
+@timer('simulate_paths')
+def simulate_input_paths(df, months, paths, simulator=None, version=None, shocks=None, bootstrap=True, seed=None):
+    """
+    Sample `paths` scenarios of the exogenous inputs around simulate_future_inputs' projection.
+    Each path adds whole historical residual rows (so the three columns move together), drawn
+    with replacement per month, and then scales each column by the path's shock.
+    Args:
+        df (pd.DataFrame): City history with a date column and EXOGENOUS_COLUMNS
+        months (int): Months to simulate
+        paths (int): Number of scenarios
+        simulator (str): Key of SIMULATORS; defaults to DEFAULT_SIMULATOR
+        version (str): Dataset version, as for simulate_future_inputs
+        shocks (dict): Column -> relative shock (0.1 = +10%), or a list of shocks each path draws one of
+        bootstrap (bool): Whether to add resampled residuals (False keeps only the shocks)
+        seed (int): Random seed, for reproducible scenarios
+    Returns:
+        np.ndarray: (paths, months, 3) inputs in EXOGENOUS_COLUMNS order, or None
+    """
+    shocks = shocks or {}
+    unknown = set(shocks) - set(EXOGENOUS_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown shock columns {sorted(unknown)}. Choose from {EXOGENOUS_COLUMNS}.")
 
-        model = LinearRegression()
-        model.fit(X, y)
+    name, _ = _simulator(simulator)
+    pri, sec, stk = simulate_future_inputs(df, months, simulator=name, version=version)
+    if pri is None:
+        return None
+    rng = np.random.default_rng(seed)
+    result = np.broadcast_to(np.column_stack([pri, sec, stk]), (paths, months, len(EXOGENOUS_COLUMNS))).copy()
 
-        future_X = np.arange(len(df), len(df) + months).reshape(-1, 1)
-        trend = model.predict(future_X)
-        trends[col] = trend.tolist()
+    if bootstrap:
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date')
+        residuals = RESIDUALS[name](df[EXOGENOUS_COLUMNS].to_numpy(dtype=float))
+        if len(residuals):
+            result += residuals[rng.integers(0, len(residuals), size=(paths, months))]
 
-        logger.info(f"Simulated trend for {col}: {trend}")
+    for j, col in enumerate(EXOGENOUS_COLUMNS):
+        if col in shocks:
+            choices = np.atleast_1d(np.asarray(shocks[col], dtype=float))
+            result[:, :, j] *= 1 + rng.choice(choices, size=paths)[:, None]
+    return result
 
-    # Log lengths of generated trends before returning
-    logger.info(f"Generated trends: primary({len(trends['primary_price_avg'])}), "
-                f"secondary({len(trends['secondary_price_avg'])}), "
-                f"stock({len(trends['stock_var'])})")
 
-    return trends['primary_price_avg'], trends['secondary_price_avg'], trends['stock_var']
+def clear_fit_cache():
+    with _fits_lock:
+        _fits.clear()
@@ -0,0 +1,268 @@
+"""
+Declarative lag/rolling feature definitions shared by data entry, training and forecasting.
+
+A spec is a list of plain dicts built with the helpers below. compile_features() turns a
+spec into a transform over NumPy row buffers that evaluates any set of row positions:
+every row for batch mode, or just the newest rows for incremental updates. Buffers may also
+be 2-D (series x rows) when several series share one date axis, as in src.panel_forecast.
+"""
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+MONTH_FIELDS = {
+    'month': lambda d: np.asarray(d.month, dtype=np.int64),
+    'year': lambda d: np.asarray(d.year, dtype=np.int64),
+    'quarter': lambda d: np.asarray(d.quarter, dtype=np.int64),
+    'month_sin': lambda d: np.sin(2 * np.pi * d.month / 12),
+    'month_cos': lambda d: np.cos(2 * np.pi * d.month / 12),
+}
+
+
+def combine(name, left, right, op):
+    """name = left + right (op='add') or left - right (op='sub')."""
+    return {'kind': 'combine', 'name': name, 'sources': (left, right), 'op': op}
+
+
+def lags(source, lag_list, by='row', name='{source}_lag_{lag}'):
+    """
+    Lagged copies of `source`. by='row' shifts by position; by='date' takes the row dated
+    exactly `lag` months earlier (NaN if there is none).
+    """
+    return [{'kind': 'lag', 'name': name.format(source=source, lag=lag), 'source': source, 'lag': lag, 'by': by}
+            for lag in lag_list]
+
+
+def rolling(name, source, window, align='trailing', include_current=True, min_periods=1,
+            min_history=0, repeat_last=False):
+    """
+    Windowed mean of `source`, skipping NaN.
+    Args:
+        align (str): 'trailing' or 'centered'
+        include_current (bool): For trailing windows, whether the row itself is in its window
+        min_periods (int): Non-NaN values needed in the window, otherwise NaN
+        min_history (int): Non-NaN values needed in all earlier rows, otherwise NaN
+        repeat_last (bool): Replace the final row's value with the one before it first
+    """
+    return {'kind': 'rolling', 'name': name, 'source': source, 'window': window, 'align': align,
+            'include_current': include_current, 'min_periods': min_periods,
+            'min_history': min_history, 'repeat_last': repeat_last}
+
+
+def calendar(name, field=None):
+    return {'kind': 'calendar', 'name': name, 'field': field or name}
+
+
+def trend(name='trend_index', mode='position'):
+    """mode='position': row number + start_index. mode='continue': previous maximum + 1."""
+    return {'kind': 'trend', 'name': name, 'mode': mode}
+
+
+# --- Columns stored in data/{city}_pr.csv (centered windows) ---
+CSV_LAG_SOURCES = ['primary_price_avg', 'secondary_price_avg', 'stock_var', 'retail_sales', 'non_retail_sales', 'price_diff']
+
+CSV_FEATURES = (
+    [combine('price_diff', 'primary_price_avg', 'secondary_price_avg', 'sub'),
+     combine('total_sales', 'retail_sales', 'non_retail_sales', 'add')]
+    + [spec for col in CSV_LAG_SOURCES for spec in lags(col, [1, 2, 3])]
+    + [rolling('primary_price_roll3', 'primary_price_avg', 3, align='centered'),
+       rolling('secondary_price_roll3', 'secondary_price_avg', 3, align='centered'),
+       rolling('retail_sales_roll3', 'retail_sales', 3, align='centered'),
+       rolling('non_retail_sales_roll3', 'non_retail_sales', 3, align='centered'),
+       trend('trend_index', mode='position'),
+       calendar('month_number', 'month'),
+       calendar('month'),
+       rolling('non_retail_sales_custom_avg', 'non_retail_sales', 3, align='centered', repeat_last=True)]
+)
+
+# --- Inputs built for each simulated month in the recursive forecaster (trailing windows) ---
+FORECAST_LAG_SOURCES = ['retail_sales', 'non_retail_sales', 'primary_price_avg', 'secondary_price_avg', 'price_diff']
+FORECAST_ROLL_SOURCES = ['primary_price_avg', 'secondary_price_avg', 'retail_sales', 'non_retail_sales']
+
+FORECAST_FEATURES = (
+    [calendar('month_sin'), calendar('month_cos'), calendar('year'), calendar('quarter'),
+     trend('trend_index', mode='continue')]
+    + [spec for lag in [1, 2, 3] for col in FORECAST_LAG_SOURCES for spec in lags(col, [lag], by='date')]
+    + [rolling(f'{col}_roll3', col, 3, include_current=False, min_history=3) for col in FORECAST_ROLL_SOURCES]
+    + [rolling('non_retail_sales_custom_avg', 'non_retail_sales', 6, include_current=False)]
+)
+
+
+@lru_cache(maxsize=None)
+def forecast_features(target):
+    """FORECAST_FEATURES plus the yearly lag of the sales target being forecast."""
+    if target in ('retail_sales', 'non_retail_sales'):
+        return FORECAST_FEATURES + lags(target, [12], by='date')
+    return FORECAST_FEATURES
+
+
+# --- Next-month row in src.feature_engineering (trailing windows, full windows required) ---
+TRAILING_FEATURES = (
+    lags('retail_sales', [1, 2, 3])
+    + [rolling('retail_sales_roll3', 'retail_sales', 3, min_periods=3)]
+    + lags('non_retail_sales', [1, 2, 3])
+    + [rolling('non_retail_sales_roll3', 'non_retail_sales', 3, min_periods=3)]
+    + lags('price_diff', [1, 2, 3])
+    + [rolling('non_retail_sales_custom_avg', 'non_retail_sales', 3, align='centered', min_periods=3)]
+)
+# Used for the newest row when its centered window is incomplete
+TRAILING_CUSTOM_AVG_FALLBACK = [rolling('non_retail_sales_custom_avg', 'non_retail_sales', 3, include_current=False)]
+
+
+def frame_buffers(df, columns):
+    """Float arrays for `columns` of df (all-NaN for columns df does not have)."""
+    buffers = {}
+    for col in columns:
+        if col in df.columns:
+            buffers[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        else:
+            buffers[col] = np.full(len(df), np.nan)
+    return buffers
+
+
+def spec_sources(specs):
+    """Source columns a spec reads from."""
+    sources = []
+    for spec in specs:
+        for col in spec.get('sources', (spec.get('source'),)):
+            if col is not None and col not in sources:
+                sources.append(col)
+    return sources
+
+
+def _window_mean(values, positions, lo, hi, min_periods):
+    """NaN-skipping mean of values[..., p + lo : p + hi + 1] for each p, clipped to the rows."""
+    offsets = np.arange(lo, hi + 1)
+    idx = positions[:, None] + offsets
+    n = values.shape[-1]
+    valid = (idx >= 0) & (idx < n)
+    window = np.where(valid, values[..., np.clip(idx, 0, n - 1)], np.nan)
+    counts = (~np.isnan(window)).sum(axis=-1)
+    sums = np.nansum(window, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((counts > 0) & (counts >= min_periods), sums / counts, np.nan)
+
+
+class _DateIndex:
+    """Month-offset lookup resolving 'row dated exactly N months earlier' by index arithmetic."""
+
+    def __init__(self, dates):
+        self.dates = pd.DatetimeIndex(dates)
+        month_no = self.dates.year * 12 + self.dates.month - 1
+        self.base = month_no.min()
+        self.slots = np.asarray(month_no - self.base)
+        span = self.slots.max() + 1
+        self.first_row = np.full(span, -1)
+        # np.unique reports the first row of each month, matching a first-match scan
+        unique_slots, first_index = np.unique(self.slots, return_index=True)
+        self.first_row[unique_slots] = first_index
+        self.slot_dates = np.full(span, np.datetime64('NaT'), dtype='datetime64[ns]')
+        has_row = self.first_row >= 0
+        self.slot_dates[has_row] = self.dates.values[self.first_row[has_row]]
+
+    def lagged_rows(self, positions, lag):
+        """Row index dated exactly `lag` months before each position, or -1."""
+        targets = (self.dates[positions] - pd.DateOffset(months=lag)).values
+        lag_slots = self.slots[positions] - lag
+        safe = np.clip(lag_slots, 0, None)
+        match = (lag_slots >= 0) & (self.slot_dates[safe] == targets)
+        return np.where(match, self.first_row[safe], -1)
+
+
+def compile_features(specs):
+    """
+    Compile a spec into transform(buffers, dates, positions, start_index=1).
+    Args (of the returned transform):
+        buffers (dict): Source column -> float array covering every row (1-D, or 2-D with one
+            row per series; features then come back 2-D, except calendar and position trends)
+        dates (pd.DatetimeIndex): Date of every row
+        positions (array): Row positions to evaluate
+        start_index (int): trend_index of row 0 for position-mode trends
+    Returns:
+        dict: Feature name -> array aligned with positions, in spec order
+    """
+    specs = list(specs)
+    needs_dates = any(s['kind'] == 'lag' and s['by'] == 'date' for s in specs)
+
+    def transform(buffers, dates, positions, start_index=1):
+        positions = np.asarray(positions, dtype=int)
+        n = len(dates)
+        dates = pd.DatetimeIndex(dates)
+        date_index = _DateIndex(dates) if needs_dates and len(positions) else None
+        out = {}
+
+        for spec in specs:
+            kind = spec['kind']
+            if kind == 'combine':
+                left, right = (buffers[c][..., positions] for c in spec['sources'])
+                out[spec['name']] = left + right if spec['op'] == 'add' else left - right
+
+            elif kind == 'lag':
+                values = buffers[spec['source']]
+                if spec['by'] == 'date':
+                    rows = date_index.lagged_rows(positions, spec['lag']) if date_index else positions
+                else:
+                    rows = positions - spec['lag']
+                out[spec['name']] = np.where(rows >= 0, values[..., np.clip(rows, 0, None)], np.nan)
+
+            elif kind == 'rolling':
+                values = buffers[spec['source']]
+                if spec['repeat_last'] and n >= 2:
+                    values = values.copy()
+                    values[..., -1] = values[..., -2]
+                w = spec['window']
+                if spec['align'] == 'centered':
+                    lo, hi = -(w // 2), w // 2
+                elif spec['include_current']:
+                    lo, hi = -(w - 1), 0
+                else:
+                    lo, hi = -w, -1
+                result = _window_mean(values, positions, lo, hi, spec['min_periods'])
+                if spec['min_history']:
+                    seen = np.cumsum(~np.isnan(values), axis=-1)
+                    seen = np.concatenate([np.zeros(seen.shape[:-1] + (1,), dtype=seen.dtype), seen], axis=-1)
+                    seen = seen[..., positions]
+                    result = np.where(seen >= spec['min_history'], result, np.nan)
+                out[spec['name']] = result
+
+            elif kind == 'calendar':
+                out[spec['name']] = MONTH_FIELDS[spec['field']](dates[positions])
+
+            elif kind == 'trend':
+                if spec['mode'] == 'position':
+                    out[spec['name']] = positions + start_index
+                else:
+                    # Each evaluated row continues from the maximum before the first one
+                    first = positions.min() if len(positions) else 0
+                    history = buffers.get(spec['name'])
+                    if history is None:
+                        base = first
+                    else:
+                        earlier = history[..., :first]
+                        empty = np.isnan(earlier).all(axis=-1)
+                        base = np.where(empty, np.nan, np.max(np.where(np.isnan(earlier), -np.inf, earlier),
+                                                              axis=-1, initial=-np.inf))
+                        base = np.expand_dims(base, -1)
+                    out[spec['name']] = base + 1 + (positions - first)
+
+        return out
+
+    return transform
+
+
+# Distinct specs compiled per process; the plans are keyed by spec content
+COMPILED_CACHE_SIZE = 64
+
+
+def _spec_key(specs):
+    return tuple(tuple(sorted(spec.items())) for spec in specs)
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compiled(key):
+    return compile_features([dict(items) for items in key])
+
+
+def compute_features(specs, buffers, dates, positions, start_index=1):
+    """compile_features(specs) applied once, with the compiled transform memoized per spec content."""
+    return _compiled(_spec_key(specs))(buffers, dates, positions, start_index=start_index)
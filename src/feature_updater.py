@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from src.data_loader import load_city_data, get_city_data_path, put_city_data
+from src.storage import encode_frame
+from src.utils import atomic_write_bytes, file_lock
+from src.feature_spec import CSV_FEATURES, compute_features, frame_buffers
+
+INPUT_COLUMNS = ['primary_price_avg', 'secondary_price_avg', 'stock_var', 'retail_sales', 'non_retail_sales']
+
+# Appending a month changes derived values of the new row and of the two rows before it
+# (centered 3-month windows, and the custom average that repeats the last value).
+RECOMPUTED_ROWS = 3
+
+
+def _apply_features(df, positions, start_index=1):
+    """Write CSV_FEATURES for the given row positions into df (other rows are left as stored)."""
+    buffers = frame_buffers(df, INPUT_COLUMNS)
+    # Derived sources (price_diff) must be current before lags of them are taken
+    buffers['price_diff'] = buffers['primary_price_avg'] - buffers['secondary_price_avg']
+    features = compute_features(CSV_FEATURES, buffers, df['date'], positions, start_index=start_index)
+    index = df.index[positions]
+    for name, values in features.items():
+        if name not in df.columns:
+            df[name] = np.nan
+        df.loc[index, name] = values
+        if np.issubdtype(values.dtype, np.integer) and not df[name].isnull().any():
+            df[name] = df[name].astype(values.dtype)
+    return df
+
+
+def engineer_features(df, start_index=1):
+    """
+    Compute the derived columns stored in data/{city}_pr.csv (batch mode of CSV_FEATURES).
+    Args:
+        df (pd.DataFrame): Rows sorted by date with numeric input columns
+        start_index (int): trend_index of the first row in df
+    Returns:
+        pd.DataFrame: df with derived columns (re)computed
+    """
+    return _apply_features(df, np.arange(len(df)), start_index=start_index)
+
+
+def append_month(city, values):
+    """
+    Append next month's inputs to the city dataset, recomputing derived columns only
+    for the rows the new month affects. The write is atomic and serialized by a file lock.
+    Args:
+        city (str): City name
+        values (dict): primary_price_avg, secondary_price_avg, stock_var, retail_sales, non_retail_sales
+    Returns:
+        pd.Timestamp: Date of the appended row
+    """
+    file_path = get_city_data_path(city)
+    with file_lock(file_path):
+        df = load_city_data(city)
+        df = df.replace(r'^\s*$', np.nan, regex=True)
+        df = df.sort_values('date').reset_index(drop=True)
+        for col in INPUT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        next_date = df['date'].max() + pd.DateOffset(months=1)
+        new_row = {'date': next_date}
+        new_row.update({col: float(values[col]) for col in INPUT_COLUMNS})
+        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+
+        first = max(len(df) - RECOMPUTED_ROWS, 0)
+        df = _apply_features(df, np.arange(first, len(df)))
+
+        raw = encode_frame(df)
+        atomic_write_bytes(file_path, raw)
+        put_city_data(city, df, raw)
+
+    return next_date
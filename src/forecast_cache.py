@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 128))
+# Optional directory for a disk-backed second tier shared by all workers on a host
+FORECAST_CACHE_DIR = os.environ.get('FORECAST_CACHE_DIR')
+
+# (city, target, data_version, model_version, simulator) -> {'months': int, 'dates': list, 'df': DataFrame}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'prefix_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _disk_path(key):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()
+    return os.path.join(FORECAST_CACHE_DIR, f"{digest}.pkl")
+
+
+def _slice(entry, months):
+    """Rows of a cached forecast covering the first `months` months of its horizon."""
+    df = entry['df']
+    if months == entry['months'] or df.empty:
+        return df.copy()
+    cutoff = entry['dates'][months - 1]
+    return df[df['date'] <= cutoff].reset_index(drop=True)
+
+
+def _store(key, entry):
+    with _cache_lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+
+
+def get_cached_forecast(key, months):
+    """
+    Look up a forecast for `months` months. A cached longer horizon answers shorter
+    requests because month i of a forecast never depends on later months.
+    Returns:
+        pd.DataFrame or None: A copy of the cached rows, or None on a miss
+    """
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry['months'] >= months:
+            _cache.move_to_end(key)
+            _stats['hits' if entry['months'] == months else 'prefix_hits'] += 1
+            return _slice(entry, months)
+
+    if FORECAST_CACHE_DIR:
+        path = _disk_path(key)
+        if os.path.exists(path):
+            try:
+                import joblib  # only needed for the optional disk tier
+                entry = joblib.load(path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable forecast cache file {path}: {e}")
+                entry = None
+            if entry is not None and entry['months'] >= months:
+                _store(key, entry)
+                with _cache_lock:
+                    _stats['disk_hits'] += 1
+                return _slice(entry, months)
+
+    with _cache_lock:
+        _stats['misses'] += 1
+    return None
+
+
+def put_cached_forecast(key, months, dates, df):
+    """Remember a forecast unless a longer horizon for the same key is already cached."""
+    with _cache_lock:
+        existing = _cache.get(key)
+        if existing is not None and existing['months'] >= months:
+            return
+    entry = {'months': months, 'dates': list(dates), 'df': df.copy()}
+    _store(key, entry)
+
+    if FORECAST_CACHE_DIR:
+        try:
+            os.makedirs(FORECAST_CACHE_DIR, exist_ok=True)
+            path = _disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            import joblib
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write forecast cache to disk: {e}")
+
+
+def get_forecast_cache_stats():
+    with _cache_lock:
+        stats = dict(_stats)
+        stats['size'] = len(_cache)
+        stats['max_size'] = FORECAST_CACHE_SIZE
+    return stats
+
+
+def clear_forecast_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,205 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+import pandas as pd
+from src.data_loader import get_last_date
+from src.india_reconciliation import reconcile_india
+from src.parallel import iter_forecast_jobs
+from src.panel_forecast import forecast_panel
+from src.jobs import GENERIC_JOB_ERROR
+from src.logger import get_logger
+from src.metrics import timer
+
+logger = get_logger(__name__)
+
+REGIONS = ['mumbai', 'delhi', 'chennai', 'durgapur']
+CITIES = REGIONS + ['india']
+TARGETS = ['retail_sales', 'non_retail_sales', 'stock_var', 'total_sales']
+INDIA_TARGETS = ['retail_sales', 'non_retail_sales', 'stock_var']
+MAX_MONTHS = 24
+
+# Batches needing at least this many per-model forecasts (Whole India needs 12) are forecast
+# in one vectorized pass (src.panel_forecast) instead of one executor task per model
+PANEL_MIN_JOBS = int(os.environ.get('PANEL_MIN_JOBS', 8))
+
+# Rendered forecasts kept per process so /download can rebuild the CSV by id
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 256))
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def validate_job(city, target, months):
+    """Normalize one requested forecast. Raises ValueError for anything the forecaster cannot serve."""
+    city = str(city or '').lower()
+    target = str(target or '').lower()
+    if city not in CITIES:
+        raise ValueError(f"Invalid city '{city}'. Choose from {CITIES}.")
+    if target not in TARGETS:
+        raise ValueError(f"Invalid target '{target}'. Choose from {TARGETS}.")
+    try:
+        months = int(months)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid months '{months}'. Must be an integer.")
+    if not 1 <= months <= MAX_MONTHS:
+        raise ValueError(f"Invalid months '{months}'. Choose between 1 and {MAX_MONTHS}.")
+    return city, target, months
+
+
+def get_result_column(target):
+    return 'predicted_total_sales' if target == 'total_sales' else f'predicted_{target}'
+
+
+def model_jobs(city, target, months):
+    """The per-model (city, target, months) forecasts a requested forecast is built from."""
+    if city == 'india':
+        return [(region, t, months) for region in REGIONS for t in INDIA_TARGETS]
+    if target == 'total_sales':
+        return [(city, 'retail_sales', months), (city, 'non_retail_sales', months)]
+    return [(city, target, months)]
+
+
+def india_readiness_error():
+    """Message explaining why Whole India cannot be forecast yet, or None when every region is current."""
+    last_dates = {}
+    for region in REGIONS:
+        try:
+            last_dates[region] = get_last_date(region)
+        except Exception as e:
+            logger.error(f"Error reading dataset for {region}: {e}")
+            return "Could not read all region CSV files. Check logs."
+    if len(set(last_dates.values())) > 1:
+        logger.warning(f"CSV files not complete for all regions. Last dates: {last_dates}")
+        return "All region CSVs must be filled to the same date for Whole India prediction. Please update missing months."
+    logger.debug("All region CSVs complete for Whole India prediction. Last date: %s", list(last_dates.values())[0])
+    return None
+
+
+def assemble_forecast(city, target, months, results):
+    """
+    Combine per-model forecasts into the requested one.
+    Args:
+        results (dict): (city, target, months) -> DataFrame from forecast_next_months (or None)
+    Returns:
+        pd.DataFrame: Forecast with a date column and get_result_column(target)
+    """
+    if city == 'india':
+        frames = {t: [] for t in INDIA_TARGETS}
+        for region in REGIONS:
+            retail_df, non_retail_df, stock_var = (results[(region, t, months)] for t in INDIA_TARGETS)
+            if retail_df is None or non_retail_df is None:
+                raise ValueError(f"Sales forecast failed for {region}.")
+            frames['retail_sales'].append(retail_df.assign(city=region))
+            frames['non_retail_sales'].append(non_retail_df.assign(city=region))
+            if stock_var is not None and 'predicted_stock_var' in stock_var.columns:
+                frames['stock_var'].append(stock_var[['date', 'predicted_stock_var']].assign(city=region))
+
+        # One merge over every region instead of one per region; row order is unchanged
+        all_cities = pd.merge(pd.concat(frames['retail_sales'], ignore_index=True),
+                              pd.concat(frames['non_retail_sales'], ignore_index=True), on=['date', 'city'], how='inner')
+        if frames['stock_var']:
+            stock_var = pd.concat(frames['stock_var'], ignore_index=True)
+            all_cities = pd.merge(all_cities, stock_var, on=['date', 'city'], how='left')
+            with_stock_var = set(stock_var['city'])
+            all_cities.loc[~all_cities['city'].isin(with_stock_var), 'predicted_stock_var'] = 0
+        else:
+            all_cities['predicted_stock_var'] = 0
+        all_cities['predicted_total_sales'] = all_cities['predicted_retail_sales'] + all_cities['predicted_non_retail_sales']
+        with timer('reconcile_india'):
+            forecast_df = reconcile_india(all_cities)
+
+    elif target == 'total_sales':
+        retail_df = results[(city, 'retail_sales', months)]
+        non_retail_df = results[(city, 'non_retail_sales', months)]
+        if retail_df is None or non_retail_df is None:
+            raise ValueError(f"Sales forecast failed for {city}.")
+        forecast_df = pd.merge(retail_df, non_retail_df, on="date", how="inner")
+        forecast_df['predicted_total_sales'] = forecast_df['predicted_retail_sales'] + forecast_df['predicted_non_retail_sales']
+
+    else:
+        forecast_df = results[(city, target, months)]
+
+    if forecast_df is None or forecast_df.empty:
+        raise ValueError("Forecast failed or returned no data.")
+    if get_result_column(target) not in forecast_df.columns:
+        raise ValueError(f"'{target}' is not available for {city}.")
+    return forecast_df
+
+
+def iter_forecasts(jobs, kind=None):
+    """
+    Run a batch of requested forecasts, sharing every per-model forecast between the jobs
+    that need it (e.g. total_sales and Whole India both reuse retail_sales).
+    Args:
+        jobs (list): Validated (city, target, months) tuples
+        kind (str): 'panel', or an executor kind for src.parallel; by default batches of
+            PANEL_MIN_JOBS or more per-model forecasts use 'panel'
+    Yields:
+        tuple: (job, forecast_df, error) in job order as soon as each job's inputs are ready;
+               exactly one of forecast_df / error is None
+    """
+    errors = {}
+    if any(city == 'india' for city, _, _ in jobs):
+        india_error = india_readiness_error()
+        if india_error:
+            errors = {job: india_error for job in jobs if job[0] == 'india'}
+
+    expanded = [[] if job in errors else model_jobs(*job) for job in jobs]
+    unique = list(dict.fromkeys(j for needed in expanded for j in needed))
+    results = {}
+    next_job = 0
+
+    def ready():
+        nonlocal next_job
+        while next_job < len(jobs) and all(j in results for j in expanded[next_job]):
+            job = jobs[next_job]
+            next_job += 1
+            if job in errors:
+                yield job, None, errors[job]
+                continue
+            try:
+                yield job, assemble_forecast(*job, results), None
+            except ValueError as e:
+                logger.error(f"Forecast failed for {job}: {e}")
+                yield job, None, str(e)
+            except Exception as e:
+                logger.exception(f"Forecast failed for {job}: {e}")
+                yield job, None, GENERIC_JOB_ERROR
+
+    yield from ready()
+    if kind == 'panel' or (kind is None and len(unique) >= PANEL_MIN_JOBS):
+        results.update(zip(unique, forecast_panel(unique)))
+        yield from ready()
+        return
+    for model_job, forecast_df in zip(unique, iter_forecast_jobs(unique, kind)):
+        results[model_job] = forecast_df
+        yield from ready()
+
+
+def run_forecast(city, target, months, kind=None):
+    """Single requested forecast. Raises ValueError with a user-facing message on failure."""
+    job = validate_job(city, target, months)
+    _, forecast_df, error = next(iter_forecasts([job], kind))
+    if error:
+        raise ValueError(error)
+    return forecast_df
+
+
+def save_result(forecast_df):
+    """Keep a rendered forecast for later download. Returns its id."""
+    forecast_id = uuid.uuid4().hex
+    with _results_lock:
+        _results[forecast_id] = forecast_df
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return forecast_id
+
+
+def get_result(forecast_id):
+    """Forecast saved by save_result, or None if it was evicted or saved by another worker."""
+    with _results_lock:
+        forecast_df = _results.get(forecast_id)
+        if forecast_df is not None:
+            _results.move_to_end(forecast_id)
+        return forecast_df
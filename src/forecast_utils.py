@@ -1,81 +1,91 @@
+import time
 import pandas as pd
 from dateutil.relativedelta import relativedelta
-from src.feature_simulator import simulate_future_inputs
-from src.model_loader import load_model
+from src.feature_simulator import simulate_future_inputs, DEFAULT_SIMULATOR
+from src.model_loader import load_model, get_model_version
+from src.data_loader import load_city_data, get_city_data_path, get_data_version
+from src.forecast_cache import get_cached_forecast, put_cached_forecast
 from src.utils import format_dates, generate_monthly_dates
 from src.logger import get_logger
-from src.recursive_forecaster import generate_next_month_features
+from src.metrics import observe, timer
+from src.recursive_forecaster import build_forecast_features
 
-logger = get_logger()
+logger = get_logger(__name__)
 
-def forecast_next_months(city, target, months=6):
-    logger.info("Entered forecast_next_months()")
-    
-    file_path = f"data/{city}_pr.csv"
-    logger.info(f"Reading data from {file_path}")
+def forecast_next_months(city, target, months=6, simulator=None):
+    start = time.perf_counter()
+    simulator = simulator or DEFAULT_SIMULATOR
+
+    data_version = None
+    try:
+        data_version = get_data_version(city)
+        cache_key = (city, target, data_version, get_model_version(city, target), simulator)
+    except Exception:
+        # Missing data or model; the regular path below logs the real error
+        cache_key = None
+    if cache_key is not None:
+        cached = get_cached_forecast(cache_key, months)
+        if cached is not None:
+            elapsed = time.perf_counter() - start
+            observe('forecast_next_months', elapsed, city=city, target=target, cache='hit')
+            logger.info("Served cached %d-month %s forecast for %s", months, target, city,
+                        extra={'city': city, 'target': target, 'months': months, 'cache': 'hit',
+                               'duration_ms': round(elapsed * 1000, 3)})
+            return cached
+
+    file_path = get_city_data_path(city)
+    logger.debug("Reading data from %s", file_path)
     
     try:
-        df = pd.read_csv(file_path, parse_dates=['date'], dayfirst=True)
+        df = load_city_data(city)
         df.columns = df.columns.str.strip()
         if 'date' not in df.columns:
-            logger.error(f"Expected 'date' column, found: {df.columns.tolist()}")
+            logger.error("Expected 'date' column, found: %s", df.columns.tolist())
             return None
         df.sort_values('date', inplace=True)
-        logger.info(f"Max date value: {df['date'].max()}")
     except Exception as e:
-        logger.error(f"Failed to read or format data: {e} | File path was: {file_path}")
+        logger.error("Failed to read or format data: %s | File path was: %s", e, file_path)
         return None
 
     try:
         latest_date = pd.to_datetime(df['date'].max())
-        logger.info(f"Last date in dataset: {latest_date.strftime('%d-%m-%Y')}")
-
-        logger.info("Generating future dates...")
+        logger.debug("Last date in dataset: %s", latest_date)
         future_dates = generate_monthly_dates(latest_date + relativedelta(months=1), months)
 
-        pri_trend, sec_trend, stk_trend = simulate_future_inputs(df, months)
+        pri_trend, sec_trend, stk_trend = simulate_future_inputs(df, months, simulator=simulator, version=data_version)
         model = load_model(city, target)
         feature_names = model.feature_names_in_
 
-        preds = []
-        working_df = df.copy()
-
-        for i in range(months):
-            new_date = future_dates[i]
-            new_row = generate_next_month_features(working_df, target, pri_trend[i], sec_trend[i], stk_trend[i], new_date)
-            working_df = pd.concat([working_df, pd.DataFrame([new_row])], ignore_index=True)
-
-        # Forward-fill missing values with last known value after all simulated rows are appended
-        working_df.ffill(inplace=True)
+        missing_features = [f for f in feature_names if f not in df.columns]
+        if missing_features:
+            logger.debug("Features not present in history, relying on generated values: %s", missing_features)
 
-        # Predict for only the future months
-        forecast_rows = working_df.iloc[-months:]
-        for i, row in forecast_rows.iterrows():
-            input_df = pd.DataFrame([row])
-            missing_features = set(feature_names) - set(input_df.columns)
-            if missing_features:
-                logger.warning(f"Missing features for prediction: {missing_features}")
-                for feature in missing_features:
-                    # Use last known value from working_df for each missing feature
-                    if feature in working_df.columns:
-                        input_df[feature] = working_df[feature].iloc[-months-1]  # last known value before forecast period
-                        logger.warning(f"Setting missing feature '{feature}' to last known value {working_df[feature].iloc[-months-1]}")
-                    else:
-                        input_df[feature] = None
+        # Build every future month's inputs at once; forecasted sales are never fed back
+        # into the history, so the whole horizon can be predicted in one batch.
+        forecast_rows = build_forecast_features(df, target, pri_trend, sec_trend, stk_trend, future_dates, feature_names)
+        X = forecast_rows[list(feature_names)]
 
-            X = pd.DataFrame([row], columns=feature_names)
+        valid = ~X.isnull().any(axis=1)
+        for date in forecast_rows.loc[~valid, 'date']:
+            logger.error("Generated input for %s contains NaN. Skipping this prediction.", date.strftime('%b-%Y'))
 
-            if X.isnull().any().any():
-                logger.error(f"Generated input for {row['date'].strftime('%b-%Y')} contains NaN. Skipping this prediction.")
-                continue
-
-            y_pred = model.predict(X)[0]
-            preds.append({'date': row['date'], f'predicted_{target}': y_pred})
-            logger.info(f"Forecasted {target} for {city} on {row['date'].strftime('%b-%Y')}: {y_pred:.2f}")
-            logger.info("Forecasting completed successfully.")
+        preds = []
+        if valid.any():
+            with timer('predict', city=city, target=target):
+                y_pred = model.predict(X[valid])
+            for date, value in zip(forecast_rows.loc[valid, 'date'], y_pred):
+                preds.append({'date': date, f'predicted_{target}': value})
+                logger.debug("Forecasted %s for %s on %s: %.2f", target, city, date.strftime('%b-%Y'), value)
+        elapsed = time.perf_counter() - start
+        observe('forecast_next_months', elapsed, city=city, target=target, cache='miss')
+        logger.info("Forecasted %d months of %s for %s", len(preds), target, city,
+                    extra={'city': city, 'target': target, 'months': months, 'cache': 'miss',
+                           'duration_ms': round(elapsed * 1000, 3)})
         forecast_df = pd.DataFrame(preds)
+        if cache_key is not None:
+            put_cached_forecast(cache_key, months, future_dates, forecast_df)
         return forecast_df
 
     except Exception as e:
-        logger.error(f"Error while forecasting: {e} | File path was: {file_path}")
+        logger.error("Error while forecasting: %s | File path was: %s", e, file_path)
         return None
\ No newline at end of file
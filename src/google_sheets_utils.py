@@ -1,85 +1,258 @@
-import gspread
+import atexit
+import os
+import threading
 import pandas as pd
 import numpy as np
-from oauth2client.service_account import ServiceAccountCredentials
-from gspread_dataframe import set_with_dataframe
 
 SHEET_NAME = "tmt_forecasting_data"
 SHEET_ID = "1EpErhtDmjRKLY4bgM_CVrQU5KDPM4GIBctyYn1bUblk"
 
+# 'google' talks to the Sheets API; 'fake' keeps tabs in process memory (offline runs and tests)
+SHEETS_BACKEND = os.environ.get('SHEETS_BACKEND', 'google')
+# Rows buffered by queue_row_for_sheet before they are sent in one append call
+SHEETS_APPEND_BATCH = int(os.environ.get('SHEETS_APPEND_BATCH', 50))
+
+# Authorized clients per credentials file, and worksheet handles (+ cached header row) per tab
+_clients = {}
+_worksheets = {}
+_pending_rows = {}
+_sheets_lock = threading.Lock()
+
+
+class FakeWorksheet:
+    """In-memory stand-in for the subset of gspread.Worksheet used here. `calls` counts API requests."""
+
+    def __init__(self, title, values=None):
+        self.title = title
+        self.values = [list(row) for row in values or []]
+        self.calls = 0
+
+    @property
+    def row_count(self):
+        return len(self.values)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.values), default=0)
+
+    def get_all_values(self):
+        self.calls += 1
+        return [list(row) for row in self.values]
+
+    def row_values(self, row):
+        self.calls += 1
+        return list(self.values[row - 1]) if row <= len(self.values) else []
+
+    def append_rows(self, rows, value_input_option=None):
+        self.calls += 1
+        self.values.extend([str(v) for v in row] for row in rows)
+
+    def resize(self, rows=None, cols=None):
+        self.calls += 1
+        if rows is not None:
+            self.values = self.values[:rows] + [[] for _ in range(rows - len(self.values))]
+        if cols is not None:
+            self.values = [(row + [''] * cols)[:cols] for row in self.values]
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls += 1
+        for update in data:
+            first_row = int(update['range'].split(':')[0].lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+            for offset, row in enumerate(update['values']):
+                index = first_row - 1 + offset
+                while len(self.values) <= index:
+                    self.values.append([])
+                self.values[index] = [str(v) for v in row]
+
+    def clear(self):
+        self.calls += 1
+        self.values = []
+
+
+_fake_tabs = {}
+
+
+def get_fake_worksheet(sheet_tab_name):
+    """The in-memory tab used when SHEETS_BACKEND='fake' (created empty on first use)."""
+    with _sheets_lock:
+        if sheet_tab_name not in _fake_tabs:
+            _fake_tabs[sheet_tab_name] = FakeWorksheet(sheet_tab_name)
+        return _fake_tabs[sheet_tab_name]
+
 
 def authorize_google_sheets(credentials_path="credentials.json"):
-    """Authorize using a Google service account JSON key file."""
+    """Authorize using a Google service account JSON key file (once per process and key file)."""
+    with _sheets_lock:
+        client = _clients.get(credentials_path)
+    if client is not None:
+        return client
+
     scope = [
         "https://spreadsheets.google.com/feeds",
         "https://www.googleapis.com/auth/drive"
     ]
+    # Sheets client libraries are optional and slow to import; load them on first use
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
     try:
         creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
         client = gspread.authorize(creds)
-        return client
     except Exception as e:
         print(f"❌ Failed to authorize Google Sheets. Check credentials.json. Error: {e}")
         raise
+    with _sheets_lock:
+        _clients[credentials_path] = client
+    return client
+
+
+def get_worksheet(sheet_tab_name, credentials_path="credentials.json"):
+    """Cached worksheet handle for a tab of SHEET_ID (or its in-memory stand-in)."""
+    if SHEETS_BACKEND == 'fake':
+        return get_fake_worksheet(sheet_tab_name)
+    key = (credentials_path, sheet_tab_name)
+    with _sheets_lock:
+        handle = _worksheets.get(key)
+    if handle is None:
+        client = authorize_google_sheets(credentials_path)
+        handle = {'sheet': client.open_by_key(SHEET_ID).worksheet(sheet_tab_name), 'headers': None}
+        with _sheets_lock:
+            handle = _worksheets.setdefault(key, handle)
+    return handle['sheet']
+
+
+def _get_headers(sheet_tab_name, credentials_path):
+    """Header row of a tab, read once and reused until the tab is rewritten."""
+    sheet = get_worksheet(sheet_tab_name, credentials_path)
+    key = (credentials_path, sheet_tab_name)
+    with _sheets_lock:
+        handle = _worksheets.setdefault(key, {'sheet': sheet, 'headers': None})
+        headers = handle['headers']
+    if headers is None:
+        headers = [h.strip() for h in sheet.row_values(1)]
+        with _sheets_lock:
+            handle['headers'] = headers
+    return headers
+
+
+def reset_sheets_cache():
+    """Drop cached clients, worksheet handles and header rows (e.g. after rotating credentials)."""
+    with _sheets_lock:
+        _clients.clear()
+        _worksheets.clear()
 
 
 def read_sheet_as_df(sheet_tab_name, credentials_path="credentials.json"):
     """Read a Google Sheet tab into a pandas DataFrame with proper typing."""
-    client = authorize_google_sheets(credentials_path)
-    sheet = client.open_by_key(SHEET_ID).worksheet(sheet_tab_name)
+    sheet = get_worksheet(sheet_tab_name, credentials_path)
     data = sheet.get_all_values()
 
     if not data or len(data) < 2:
         return pd.DataFrame()
 
     headers = [h.strip() for h in data[0]]
-    df = pd.DataFrame(data[1:], columns=headers)
-
-    # Strip whitespace from all string entries
-    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    df = pd.DataFrame(data[1:], columns=headers, dtype=object)
 
-    # Convert columns to appropriate types
+    # Strip whitespace and convert columns to appropriate types, one column at a time
     for col in df.columns:
+        values = df[col].astype(str).str.strip()
         col_clean = col.lower()
         if col_clean == 'date':
-            df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+            df[col] = pd.to_datetime(values, dayfirst=True, errors='coerce')
         elif col_clean not in ['month', 'city']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = pd.to_numeric(values, errors='coerce')
+        else:
+            df[col] = values
 
     return df
 
 
+def _format_column(values):
+    """Sheet cell strings for one column: dates as dd-mm-YYYY, integral floats without '.0', NaN as ''."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime('%d-%m-%Y').fillna('').tolist()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        missing = np.isnan(numbers)
+        integral = ~missing & (numbers == np.round(numbers)) & (np.abs(numbers) < 2 ** 53)
+        text = values.astype(str).to_numpy(dtype=object)
+        text[integral] = numbers[integral].astype(np.int64).astype(str)
+        text[missing] = ''
+        return text.tolist()
+    return values.astype(object).where(values.notnull(), '').astype(str).tolist()
+
+
+def _to_grid(df):
+    """Header row plus one list of cell strings per DataFrame row."""
+    columns = [_format_column(df[col]) for col in df.columns]
+    return [list(df.columns)] + [list(row) for row in zip(*columns)]
+
+
+def _column_letter(n):
+    letters = ''
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _changed_ranges(old, new, width):
+    """A1 ranges and values covering every run of consecutive rows that differ between the grids."""
+    def padded(row):
+        return (list(row) + [''] * width)[:width]
+
+    updates, start = [], None
+    for i in range(len(new) + 1):
+        changed = i < len(new) and (i >= len(old) or padded(old[i]) != padded(new[i]))
+        if changed and start is None:
+            start = i
+        elif not changed and start is not None:
+            updates.append({
+                'range': f"A{start + 1}:{_column_letter(width)}{i}",
+                'values': [padded(row) for row in new[start:i]],
+            })
+            start = None
+    return updates
+
+
 def write_df_to_sheet(df, sheet_tab_name, credentials_path="credentials.json"):
-    """Write a pandas DataFrame to a Google Sheet tab with proper formatting."""
-    client = authorize_google_sheets(credentials_path)
-    sheet = client.open_by_key(SHEET_ID).worksheet(sheet_tab_name)
-    sheet.clear()
+    """
+    Make a Google Sheet tab hold exactly `df`, sending only the rows that changed
+    (one batch update) instead of clearing and rewriting the whole tab.
+    Returns:
+        int: Number of rows written
+    """
+    sheet = get_worksheet(sheet_tab_name, credentials_path)
 
     df = df.copy()
 
     # Standardize and clean column names
     df.columns = df.columns.str.strip()
 
-    # Format 'date' column as string in DD-MM-YYYY for user display
+    # Format 'date' column as DD-MM-YYYY for user display
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%d-%m-%Y')
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
 
-    # Safely handle missing data
-    df.replace([np.nan, None], "", inplace=True)
+    new = _to_grid(df)
+    old = sheet.get_all_values()
+    width = len(df.columns)
 
-    # Use gspread's helper to push DataFrame with correct types
-    set_with_dataframe(sheet, df, include_index=False, include_column_header=True, resize=True)
+    # Match the grid to the new shape (drops stale trailing rows/columns)
+    if sheet.row_count != len(new) or sheet.col_count != width:
+        sheet.resize(rows=len(new), cols=width)
+        old = old[:len(new)]
 
+    updates = _changed_ranges(old, new, width)
+    if updates:
+        sheet.batch_update(updates, value_input_option="USER_ENTERED")
 
-def append_row_to_sheet(row_dict, sheet_tab_name, credentials_path="credentials.json"):
-    """Append a single row to a Google Sheet tab based on matching headers."""
-    client = authorize_google_sheets(credentials_path)
-    sheet = client.open_by_key(SHEET_ID).worksheet(sheet_tab_name)
+    with _sheets_lock:
+        handle = _worksheets.get((credentials_path, sheet_tab_name))
+        if handle is not None:
+            handle['headers'] = list(df.columns)
+    return sum(len(u['values']) for u in updates)
 
-    # Get and clean header row
-    headers = [h.strip() for h in sheet.row_values(1)]
 
-    # Format values properly
+def _format_row(row_dict, headers):
     formatted_row = []
     for col in headers:
         val = row_dict.get(col, "")
@@ -87,11 +260,57 @@ def append_row_to_sheet(row_dict, sheet_tab_name, credentials_path="credentials.
             # Convert to DD-MM-YYYY if needed
             try:
                 val = pd.to_datetime(val, dayfirst=True).strftime('%d-%m-%Y')
-            except:
+            except (ValueError, TypeError):
                 val = str(val)
         elif isinstance(val, float):
             val = round(val, 2)  # Limit float precision
         formatted_row.append(str(val))
+    return formatted_row
+
+
+def append_rows_to_sheet(rows, sheet_tab_name, credentials_path="credentials.json"):
+    """Append several rows (dicts keyed by header) to a tab in one API call."""
+    if not rows:
+        return
+    headers = _get_headers(sheet_tab_name, credentials_path)
+    sheet = get_worksheet(sheet_tab_name, credentials_path)
+    # USER_ENTERED so Google Sheets parses types automatically
+    sheet.append_rows([_format_row(row, headers) for row in rows], value_input_option="USER_ENTERED")
+
+
+def append_row_to_sheet(row_dict, sheet_tab_name, credentials_path="credentials.json"):
+    """Append a single row to a Google Sheet tab based on matching headers."""
+    append_rows_to_sheet([row_dict], sheet_tab_name, credentials_path)
+
+
+def queue_row_for_sheet(row_dict, sheet_tab_name, credentials_path="credentials.json"):
+    """Buffer a row for append; the tab's buffer is sent once it holds SHEETS_APPEND_BATCH rows."""
+    key = (credentials_path, sheet_tab_name)
+    with _sheets_lock:
+        pending = _pending_rows.setdefault(key, [])
+        pending.append(row_dict)
+        if len(pending) < SHEETS_APPEND_BATCH:
+            return
+        _pending_rows[key] = []
+    append_rows_to_sheet(pending, sheet_tab_name, credentials_path)
+
+
+def flush_sheet_appends():
+    """Send every buffered row, one append call per tab. Returns the number of rows sent."""
+    with _sheets_lock:
+        batches = [(key, rows) for key, rows in _pending_rows.items() if rows]
+        _pending_rows.clear()
+    for (credentials_path, sheet_tab_name), rows in batches:
+        append_rows_to_sheet(rows, sheet_tab_name, credentials_path)
+    return sum(len(rows) for _, rows in batches)
+
+
+def _flush_at_exit():
+    """Send rows still buffered when the process exits, so a partial batch is never dropped."""
+    try:
+        flush_sheet_appends()
+    except Exception as e:
+        print(f"❌ Failed to send buffered rows to Google Sheets on exit. Error: {e}")
+
 
-    # Append using USER_ENTERED so Google Sheets parses types automatically
-    sheet.append_row(formatted_row, value_input_option="USER_ENTERED")
+atexit.register(_flush_at_exit)
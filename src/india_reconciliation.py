@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+SHORTFALL_THRESHOLD = 275_000
+STOCK_VAR_CAP = 250_000
+
+
+def _matrix(df, col, months, regions):
+    """(months x regions) float matrix of `col`; NaN where a region has no row for a month."""
+    if col not in df.columns:
+        return np.zeros((len(months), len(regions)))
+    table = df.pivot(index='date', columns='city', values=col)
+    return table.reindex(index=months, columns=regions).to_numpy(dtype=float, copy=True)
+
+
+def reconcile_india(all_cities_df, shortfall_threshold=SHORTFALL_THRESHOLD, stock_var_cap=STOCK_VAR_CAP):
+    """
+    Aggregate region forecasts into India totals, applying the reconciliation rules:
+      Rule 1: if a month's total sales fall short of `shortfall_threshold`, the shortfall
+              is added to every region's stock_var in the following month.
+      Rule 2: if a month's stock_var exceeds `stock_var_cap`, the excess is added to each
+              region's non_retail_sales in proportion to its share of total sales.
+    Total sales are never adjusted, so every shortfall is known up front and both rules
+    reduce to whole-matrix operations.
+    Args:
+        all_cities_df (pd.DataFrame): One row per (city, date) with predicted_total_sales,
+            predicted_retail_sales, predicted_non_retail_sales and optionally predicted_stock_var
+        shortfall_threshold (float): Rule 1 threshold
+        stock_var_cap (float): Rule 2 cap
+    Returns:
+        pd.DataFrame: date, predicted_total_sales, predicted_retail_sales, predicted_non_retail_sales
+    """
+    months = np.sort(all_cities_df['date'].unique())
+    regions = list(pd.unique(all_cities_df['city']))
+
+    total = _matrix(all_cities_df, 'predicted_total_sales', months, regions)
+    retail = _matrix(all_cities_df, 'predicted_retail_sales', months, regions)
+    non_retail = _matrix(all_cities_df, 'predicted_non_retail_sales', months, regions)
+    stock_var = _matrix(all_cities_df, 'predicted_stock_var', months, regions)
+
+    total_sum = np.nansum(total, axis=1)
+
+    # Rule 1: carry each month's shortfall into the next month's stock_var
+    shortfall = np.where(total_sum < shortfall_threshold, shortfall_threshold - total_sum, 0.0)
+    stock_var[1:] = stock_var[1:] + shortfall[:-1, None]
+
+    # Rule 2: redistribute stock_var above the cap to non-retail sales by sales share
+    stock_sum = np.nansum(stock_var, axis=1)
+    excess = np.where(stock_sum > stock_var_cap, stock_sum - stock_var_cap, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = np.where(total_sum[:, None] > 0, total / total_sum[:, None], 0.0)
+    non_retail = non_retail + excess[:, None] * ratios
+
+    return pd.DataFrame({
+        'date': months,
+        'predicted_total_sales': total_sum,
+        'predicted_retail_sales': np.nansum(retail, axis=1),
+        'predicted_non_retail_sales': np.nansum(non_retail, axis=1),
+    })
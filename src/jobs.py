@@ -0,0 +1,147 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.logger import get_logger, run_with_context
+
+logger = get_logger(__name__)
+
+# Forecast requests computed at once per process, and how many may wait behind them
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 32))
+# Finished jobs are kept this long for polling clients
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 600))
+# Longest a single long-poll request may block
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', 30))
+# What clients see when a job fails for any reason other than a ValueError (those carry user-facing messages)
+GENERIC_JOB_ERROR = "Forecast failed. Check logs."
+
+
+class QueueFullError(Exception):
+    """Raised by submit_job when JOB_QUEUE_LIMIT jobs are already queued or running."""
+
+
+_jobs = {}
+_inflight = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_stats = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'run_seconds': 0.0}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='forecast-job')
+    return _executor
+
+
+def _purge_expired(now):
+    expired = [job_id for job_id, job in _jobs.items()
+               if job['finished'] is not None and now - job['finished'] > JOB_RESULT_TTL]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+def _run(job, fn, args):
+    with _jobs_lock:
+        job['status'] = 'running'
+        job['started'] = time.time()
+    user_error = False
+    try:
+        result, error, status = fn(*args), None, 'done'
+    except ValueError as e:
+        logger.error(f"Job {job['id']} failed: {e}")
+        result, error, status, user_error = None, str(e), 'failed', True
+    except Exception as e:
+        logger.exception(f"Job {job['id']} failed: {e}")
+        result, error, status = None, GENERIC_JOB_ERROR, 'failed'
+    with _jobs_lock:
+        job.update(result=result, error=error, status=status, finished=time.time(), user_error=user_error)
+        _stats['completed' if status == 'done' else 'failed'] += 1
+        _stats['run_seconds'] += job['finished'] - job['started']
+        if _inflight.get(job['key']) == job['id']:
+            del _inflight[job['key']]
+    job['event'].set()
+
+
+def submit_job(fn, *args, key=None):
+    """
+    Queue fn(*args) on the bounded job pool.
+    Args:
+        key (hashable): Jobs with the same key share one run while it is queued or running
+    Returns:
+        str: Job id
+    Raises:
+        QueueFullError: JOB_QUEUE_LIMIT jobs are already queued or running
+    """
+    now = time.time()
+    with _jobs_lock:
+        _purge_expired(now)
+        if key is not None and key in _inflight:
+            _stats['coalesced'] += 1
+            return _inflight[key]
+        active = sum(1 for job in _jobs.values() if job['status'] in ('queued', 'running'))
+        if active >= JOB_QUEUE_LIMIT:
+            _stats['rejected'] += 1
+            raise QueueFullError(f"{active} forecast jobs already queued or running.")
+
+        job = {'id': uuid.uuid4().hex, 'key': key, 'status': 'queued', 'created': now,
+               'started': None, 'finished': None, 'result': None, 'error': None, 'user_error': False,
+               'event': threading.Event()}
+        _jobs[job['id']] = job
+        if key is not None:
+            _inflight[key] = job['id']
+        _stats['submitted'] += 1
+
+    _get_executor().submit(run_with_context(_run, job, fn, args))
+    return job['id']
+
+
+def get_job(job_id, wait=0):
+    """
+    Snapshot of a job, optionally blocking up to `wait` seconds (capped at JOB_MAX_WAIT) for it to finish.
+    Returns:
+        dict: id, status ('queued', 'running', 'done', 'failed'), result, error and timings; None if unknown
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    if wait > 0:
+        job['event'].wait(min(wait, JOB_MAX_WAIT))
+    with _jobs_lock:
+        return {k: v for k, v in job.items() if k not in ('event', 'key', 'user_error')}
+
+
+def run_job(fn, *args, key=None, timeout=None):
+    """
+    submit_job + wait: run fn(*args) on the bounded pool from a request thread.
+    Raises:
+        QueueFullError: The pool is saturated
+        TimeoutError: The job did not finish within `timeout` seconds (it keeps running)
+        ValueError: The job raised one; its message is meant for users
+        RuntimeError: The job raised anything else (logged); the message is GENERIC_JOB_ERROR
+    """
+    job_id = submit_job(fn, *args, key=key)
+    with _jobs_lock:
+        job = _jobs[job_id]
+    if not job['event'].wait(timeout):
+        raise TimeoutError(f"Job {job_id} still running after {timeout}s.")
+    if job['status'] == 'failed':
+        raise (ValueError if job['user_error'] else RuntimeError)(job['error'])
+    return job['result']
+
+
+def get_job_stats():
+    """Queue depth and throughput counters for this process."""
+    with _jobs_lock:
+        statuses = [job['status'] for job in _jobs.values()]
+        return {
+            **_stats,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'retained': len(statuses),
+            'workers': JOB_WORKERS,
+            'queue_limit': JOB_QUEUE_LIMIT,
+        }
@@ -1,20 +1,185 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import threading
+from datetime import datetime, timedelta
 
-def get_logger(name='app_logger'):
-    log_dir = "logs"
-    os.makedirs(log_dir, exist_ok=True)
-    
-    log_file = os.path.join(log_dir, f"{datetime.now().strftime('%d-%m-%Y')}.log")
+LOG_DIR = "logs"
+ROOT_LOGGER = 'app_logger'
 
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+# Default level, plus per-module overrides: LOG_LEVELS="src.forecast_utils=WARNING,src.parallel=DEBUG"
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+# 'text' (default) or 'json' (one object per line with request_id and any extra fields)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# One append-only file per day (logs/dd-mm-YYYY.log), as before; set to delete files older than N days (0 keeps all)
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 0))
+LOG_FILE_DATE_FORMAT = '%d-%m-%Y'
 
-    if not logger.handlers:
-        file_handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+# Id of the request (or job) being handled; set by app.py and carried into worker threads
+request_id_var = contextvars.ContextVar('request_id', default='-')
 
-    return logger
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={...} fields (city, duration_ms, ...) become keys."""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    Appends to logs/dd-mm-YYYY.log, switching files when the day changes. Nothing is ever
+    renamed, so every web worker and training process can write through its own handler.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.day = datetime.now().date()
+        super().__init__(self._path(self.day), mode='a', delay=True)
+        self.prune()
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{day.strftime(LOG_FILE_DATE_FORMAT)}.log")
+
+    def emit(self, record):
+        day = datetime.fromtimestamp(record.created).date()
+        if day != self.day:
+            self.acquire()
+            try:
+                self.day = day
+                self.close()
+                self.baseFilename = os.path.abspath(self._path(day))
+            finally:
+                self.release()
+            self.prune()
+        super().emit(record)
+
+    def prune(self):
+        """Delete daily files older than LOG_RETENTION_DAYS (other processes may race; that is harmless)."""
+        if LOG_RETENTION_DAYS <= 0:
+            return
+        cutoff = self.day - timedelta(days=LOG_RETENTION_DAYS)
+        for filename in os.listdir(self.directory):
+            try:
+                day = datetime.strptime(filename, f"{LOG_FILE_DATE_FORMAT}.log").date()
+            except ValueError:
+                continue
+            if day < cutoff:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+
+def _file_handler():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    handler = DailyFileHandler(LOG_DIR)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'))
+    return handler
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _configure():
+    """Attach the queue handler once per process; the file is written by a background listener thread."""
+    global _configured, _listener
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL.upper())
+        root.propagate = False
+
+        records = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(records)
+        # Request ids are read in the logging thread, before the record is queued
+        queue_handler.addFilter(RequestIdFilter())
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(records, _file_handler(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+        for name, level in _parse_levels(LOG_LEVELS).items():
+            logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(level)
+        _configured = True
+
+
+def _reset_after_fork():
+    """Forked workers (process pools) get their own queue and listener; the parent's thread is not copied."""
+    global _configured, _configure_lock
+    _configure_lock = threading.Lock()
+    if not _configured:
+        return
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _configured = False
+    _configure()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_logger(name=None):
+    """
+    Logger writing through the shared non-blocking queue handler.
+    Args:
+        name (str): Module name (pass __name__) so LOG_LEVELS can target it; None for the app-wide logger
+    """
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
+
+
+def stop_logging():
+    """Flush queued records to disk and stop the listener thread (safe to call more than once)."""
+    global _listener
+    with _configure_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def run_with_context(fn, *args):
+    """Bind the caller's context (request id) to fn for execution on another thread."""
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(fn, *args)
@@ -0,0 +1,112 @@
+"""
+Per-stage latency histograms, exposed in Prometheus text format by app.py's /metrics.
+
+Timings are kept per process (each gunicorn worker reports its own), labelled by stage
+and, where it applies, city and target.
+"""
+import bisect
+import threading
+import time
+from contextlib import ContextDecorator
+
+METRIC_NAME = 'forecast_stage_duration_seconds'
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (stage, ((label, value), ...)) -> {'counts': per-bucket counts (last = +Inf), 'sum': float, 'count': int}
+_histograms = {}
+_metrics_lock = threading.Lock()
+
+
+def observe(stage, seconds, **labels):
+    """Record one duration for `stage`."""
+    key = (stage, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _metrics_lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'counts': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+        hist['counts'][index] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+
+
+class timer(ContextDecorator):
+    """
+    Time a block or function into the `stage` histogram:
+
+        with timer('predict', city=city, target=target):
+            ...
+
+        @timer('render')
+        def render(...): ...
+    """
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call, so concurrent calls never share a start time
+        return timer(self.stage, **self.labels)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        observe(self.stage, self.elapsed, **self.labels)
+        return False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def get_stage_summary():
+    """{stage: {'count', 'sum', 'mean'}} across all label sets, for logs and benchmarks."""
+    summary = {}
+    with _metrics_lock:
+        for (stage, _), hist in _histograms.items():
+            entry = summary.setdefault(stage, {'count': 0, 'sum': 0.0})
+            entry['count'] += hist['count']
+            entry['sum'] += hist['sum']
+    for entry in summary.values():
+        entry['mean'] = entry['sum'] / entry['count'] if entry['count'] else 0.0
+    return summary
+
+
+def render_metrics(gauges=None):
+    """
+    Prometheus text exposition of every stage histogram.
+    Args:
+        gauges (dict): Extra metric name -> number (e.g. cache and queue counters) appended as gauges
+    """
+    lines = [f"# HELP {METRIC_NAME} Time spent per forecasting stage.", f"# TYPE {METRIC_NAME} histogram"]
+    with _metrics_lock:
+        snapshot = sorted(((key, dict(hist, counts=list(hist['counts']))) for key, hist in _histograms.items()),
+                          key=lambda item: repr(item[0]))
+
+    for (stage, labels), hist in snapshot:
+        base = (('stage', stage),) + labels
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), hist['counts']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{METRIC_NAME}_bucket{{{_label_text(base + (("le", le),))}}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{{_label_text(base)}}} {hist["sum"]!r}')
+        lines.append(f'{METRIC_NAME}_count{{{_label_text(base)}}} {hist["count"]}')
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(value)!r}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _histograms.clear()
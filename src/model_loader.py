@@ -1,5 +1,142 @@
-import joblib
+import hashlib
+import io
+import os
+import threading
+import time
+from src.utils import get_model_path
+from src.compiled_model import CompiledModel, artifact_path
+from src.logger import get_logger
+from src.metrics import timer
+
+logger = get_logger(__name__)
+
+MODEL_DIR = "models"
+# 'compiled' (default): serve models/{city}_{target}.npz when it matches the pickle; 'pickle': always unpickle
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'compiled')
+
+# (city, target) -> {'model': estimator or CompiledModel, 'stamp': file stamps, 'version': sha1 of the pickle, 'path': str}
+_registry = {}
+_registry_lock = threading.Lock()
+_key_locks = {}
+_stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'load_seconds': 0.0}
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _stamps(path):
+    """Stamp of the pickle plus its compiled artifact (None when there is none or it is not used)."""
+    compiled = artifact_path(path)
+    use_compiled = MODEL_FORMAT == 'compiled' and os.path.exists(compiled)
+    return (_file_stamp(path), _file_stamp(compiled) if use_compiled else None)
+
+
+def _load(path, raw, version):
+    """CompiledModel if a matching artifact exists, otherwise the unpickled estimator."""
+    compiled = artifact_path(path)
+    if MODEL_FORMAT == 'compiled' and os.path.exists(compiled):
+        try:
+            model = CompiledModel.load(compiled)
+            if model.source_version == version:
+                return model
+            logger.warning(f"Compiled artifact {compiled} is stale; falling back to {path}")
+        except Exception as e:
+            logger.warning(f"Could not read compiled artifact {compiled}: {e}")
+    # joblib (and sklearn, when unpickling) load only when a model has no usable artifact
+    import joblib
+    return joblib.load(io.BytesIO(raw))
+
+
+def _key_lock(key):
+    with _registry_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def _get_entry(city, target):
+    key = (city, target)
+    path = get_model_path(city, target)
+    stamp = _stamps(path)
+
+    entry = _registry.get(key)
+    if entry is not None and entry['stamp'] == stamp:
+        with _registry_lock:
+            _stats['hits'] += 1
+        return entry
+
+    with _key_lock(key):
+        # Another thread may have loaded it while we waited for the lock
+        entry = _registry.get(key)
+        if entry is not None and entry['stamp'] == stamp:
+            with _registry_lock:
+                _stats['hits'] += 1
+            return entry
+
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            raw = f.read()
+        version = hashlib.sha1(raw).hexdigest()
+        model = _load(path, raw, version)
+        elapsed = time.perf_counter() - start
+        new_entry = {'model': model, 'stamp': stamp, 'version': version, 'path': path}
+
+        with _registry_lock:
+            _stats['misses'] += 1
+            if entry is not None:
+                _stats['reloads'] += 1
+            _stats['load_seconds'] += elapsed
+            _registry[key] = new_entry
+
+    logger.info("Loaded model %s (%s) in %.1f ms", path, type(new_entry['model']).__name__, elapsed * 1000,
+                extra={'model_path': path, 'duration_ms': round(elapsed * 1000, 3)})
+    return new_entry
+
 
 def load_model(city, target):
-    path = f'models/{city}_{target}.pkl'
-    return joblib.load(path)
+    """Return the model for (city, target), unpickling it only when the file changed."""
+    with timer('load_model', city=city, target=target):
+        return _get_entry(city, target)['model']
+
+
+def get_model_version(city, target):
+    """Content hash of models/{city}_{target}.pkl as currently loaded."""
+    return _get_entry(city, target)['version']
+
+
+def preload_models():
+    """Load every models/{city}_{target}.pkl into the registry. Returns the keys loaded."""
+    model_dir = MODEL_DIR
+    loaded = []
+    if not os.path.isdir(model_dir):
+        logger.warning(f"Model directory not found, skipping preload: {model_dir}")
+        return loaded
+
+    for filename in sorted(os.listdir(model_dir)):
+        if not filename.endswith('.pkl') or '_' not in filename:
+            continue
+        city, target = filename[:-len('.pkl')].split('_', 1)
+        try:
+            load_model(city, target)
+            loaded.append((city, target))
+        except Exception as e:
+            logger.error(f"Failed to preload model {filename}: {e}")
+
+    logger.info(f"Preloaded {len(loaded)} models from {model_dir}")
+    return loaded
+
+
+def get_model_stats():
+    """Snapshot of registry counters: hits, misses, reloads, total load time and cached keys."""
+    with _registry_lock:
+        stats = dict(_stats)
+        stats['cached'] = sorted(f"{city}_{target}" for city, target in _registry)
+    return stats
+
+
+def clear_model_cache():
+    with _registry_lock:
+        _registry.clear()
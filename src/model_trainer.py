@@ -1,15 +1,25 @@
+import io
 import os
+import time
+import hashlib
 import joblib
 import numpy as np
-from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, ParameterSampler
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.svm import SVR
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from src.feature_selector import select_top_features
-import pandas as pd
+from src.utils import atomic_write_json, atomic_write_bytes
+from src.compiled_model import save_artifact, artifact_path
+from src.data_loader import load_city_data, get_city_data_path
+from src.logger import get_logger
 import json
 
+logger = get_logger(__name__)
+
 MODELS = {
     'Linear Regression': LinearRegression(),
     'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
@@ -17,6 +27,31 @@ MODELS = {
     'SVR': SVR()
 }
 
+# Hyperparameters searched per MODELS entry (on top of the base estimator's settings)
+PARAM_GRIDS = {
+    'Linear Regression': {},
+    'Random Forest': {'n_estimators': [100, 200], 'max_depth': [None, 4], 'min_samples_leaf': [1, 3]},
+    'Gradient Boosting': {'n_estimators': [50, 100], 'learning_rate': [0.05, 0.1], 'max_depth': [2, 3]},
+    'SVR': {'C': [1e2, 1e3, 1e4, 1e5], 'epsilon': [0.1, 10.0]},
+}
+
+# 'grid' tries every PARAM_GRIDS combination; 'random' samples SEARCH_ITER per family
+SEARCH_MODE = os.environ.get('SEARCH_MODE', 'grid')
+SEARCH_ITER = int(os.environ.get('SEARCH_ITER', 6))
+
+# Incremental updates grow forests/boosting by WARM_START_ESTIMATORS trees; past
+# WARM_START_MAX_ESTIMATORS the ensemble is refit at its current size instead
+WARM_START_ESTIMATORS = int(os.environ.get('WARM_START_ESTIMATORS', 20))
+WARM_START_MAX_ESTIMATORS = int(os.environ.get('WARM_START_MAX_ESTIMATORS', 400))
+
+# Rolling-origin CV: CV_FOLDS successive origins, each scored on the next CV_HORIZON months,
+# with at least CV_MIN_TRAIN months to train on
+CV_FOLDS = int(os.environ.get('CV_FOLDS', 4))
+CV_HORIZON = int(os.environ.get('CV_HORIZON', 3))
+CV_MIN_TRAIN = int(os.environ.get('CV_MIN_TRAIN', 12))
+# After each fold, configurations whose mean RMSE so far exceeds the best by this factor are dropped
+CV_PRUNE_RATIO = float(os.environ.get('CV_PRUNE_RATIO', 1.5))
+
 # ---- Specify your custom features for Mumbai and Durgapur retail sales here ----
 CUSTOM_MUMBAI_RETAIL_FEATURES = [
     "retail_sales_roll3",
@@ -41,84 +76,277 @@ CUSTOM_DURGAPUR_RETAIL_FEATURES = [
     "stock_var_lag_3",
     "retail_sales_lag_2"
 ]
-def evaluate_models(X, y):
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    best_model, best_score = None, -1
-    best_name, best_metrics = '', {}
-
-    for name, model in MODELS.items():
-        model.fit(X_train, y_train)
-        preds = model.predict(X_test)
-        r2 = r2_score(y_test, preds)
-        if r2 > best_score:
-            best_model = model
-            best_score = r2
-            best_name = name
-            best_metrics = {
-                'MAE': mean_absolute_error(y_test, preds),
-                'RMSE': np.sqrt(mean_squared_error(y_test, preds)),
-                'R2': r2
-            }
 
+
+# Fold matrices of the search in progress: set once per worker process by the pool initializer
+# (or in-process when searching serially), so candidates never rebuild or re-send them
+_search_data = None
+
+
+def rolling_origin_folds(n, n_folds=CV_FOLDS, horizon=CV_HORIZON, min_train=CV_MIN_TRAIN):
+    """
+    Expanding-window splits over n rows in date order, latest origin first.
+    Returns:
+        list: (train_end, test_end) pairs; each fold trains on rows [0, train_end) and scores [train_end, test_end)
+    """
+    folds = []
+    for k in range(n_folds):
+        origin = n - (k + 1) * horizon
+        if origin < min_train:
+            break
+        folds.append((origin, origin + horizon))
+    if not folds and n >= 2:
+        # Too little history for a full fold: hold out the last ~20% of months
+        origin = min(n - 1, max(1, round(n * 0.8)))
+        folds.append((origin, n))
+    return folds
+
+
+def search_candidates(mode=None, n_iter=None):
+    """(family name, params) pairs to evaluate, from PARAM_GRIDS."""
+    mode = mode or SEARCH_MODE
+    n_iter = n_iter or SEARCH_ITER
+    if mode not in ('grid', 'random'):
+        raise ValueError(f"Unknown search mode '{mode}'. Choose from ['grid', 'random'].")
+
+    candidates = []
+    for name, grid in PARAM_GRIDS.items():
+        if mode == 'random' and grid:
+            sampled = ParameterSampler(grid, n_iter=min(n_iter, len(ParameterGrid(grid))), random_state=42)
+        else:
+            sampled = ParameterGrid(grid)
+        candidates += [(name, dict(params)) for params in sampled]
+    return candidates
+
+
+def _init_search(X, y, folds):
+    global _search_data
+    _search_data = [(X[:train_end], y[:train_end], X[train_end:test_end]) for train_end, test_end in folds]
+
+
+def _clear_search():
+    global _search_data
+    _search_data = None
+
+
+def _score_config(name, params, fold_index):
+    X_train, y_train, X_test = _search_data[fold_index]
+    model = clone(MODELS[name]).set_params(**params)
+    model.fit(X_train, y_train)
+    return model.predict(X_test)
+
+
+def _rmse(y_true, y_pred):
+    return float(np.sqrt(mean_squared_error(y_true, y_pred)))
+
+
+def evaluate_models(X, y, n_jobs=1):
+    """
+    Pick a model family and hyperparameters by rolling-origin CV, then refit the winner on every row.
+    Folds run newest first; after each one, configurations whose mean RMSE is more than
+    CV_PRUNE_RATIO times the best are dropped.
+    Args:
+        X (pd.DataFrame): Complete feature rows in date order
+        y (pd.Series): Target aligned with X
+        n_jobs (int): Worker processes for the search; 1 searches in-process
+    Returns:
+        tuple: (fitted model, family name, metrics) with MAE/RMSE/R2 over the winner's out-of-fold
+            predictions, its params and the search counts
+    """
+    start = time.perf_counter()
+    X_values, y_values = X.to_numpy(dtype=float), y.to_numpy(dtype=float)
+    folds = rolling_origin_folds(len(X_values))
+    if not folds:
+        raise ValueError(f"Need at least 2 complete rows to train, got {len(X_values)}.")
+
+    candidates = search_candidates()
+    errors = [[] for _ in candidates]
+    predictions = [[] for _ in candidates]
+    alive = list(range(len(candidates)))
+
+    executor = None
+    if n_jobs and n_jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_search,
+                                       initargs=(X_values, y_values, folds))
+    else:
+        _init_search(X_values, y_values, folds)
+    try:
+        for fold_index, (train_end, test_end) in enumerate(folds):
+            names = [candidates[i][0] for i in alive]
+            params = [candidates[i][1] for i in alive]
+            if executor is None:
+                fold_preds = list(map(_score_config, names, params, [fold_index] * len(alive)))
+            else:
+                fold_preds = list(executor.map(_score_config, names, params, [fold_index] * len(alive)))
+
+            y_test = y_values[train_end:test_end]
+            for i, preds in zip(alive, fold_preds):
+                errors[i].append(_rmse(y_test, preds))
+                predictions[i].append(preds)
+
+            if fold_index < len(folds) - 1:
+                best = min(np.mean(errors[i]) for i in alive)
+                alive = [i for i in alive if np.mean(errors[i]) <= best * CV_PRUNE_RATIO]
+    finally:
+        if executor is None:
+            _clear_search()
+        else:
+            executor.shutdown()
+
+    best_index = min(alive, key=lambda i: np.mean(errors[i]))
+    best_name, best_params = candidates[best_index]
+
+    y_oof = np.concatenate([y_values[train_end:test_end] for train_end, test_end in folds])
+    oof = np.concatenate(predictions[best_index])
+    best_metrics = {
+        'MAE': mean_absolute_error(y_oof, oof),
+        'RMSE': _rmse(y_oof, oof),
+        'R2': r2_score(y_oof, oof) if len(y_oof) > 1 else float('nan'),
+        'params': best_params,
+        'folds': len(folds),
+        'configs': len(candidates),
+        'pruned': len(candidates) - len(alive),
+    }
+
+    best_model = clone(MODELS[best_name]).set_params(**best_params).fit(X, y)
+    logger.info("Model search over %d rows: %d configs x %d folds (%d pruned), picked %s %s (CV RMSE %.2f) in %.2fs",
+                len(X_values), len(candidates), len(folds), best_metrics['pruned'], best_name, best_params,
+                best_metrics['RMSE'], time.perf_counter() - start)
     return best_model, best_name, best_metrics
 
-def train_and_save(city, df, target, output_dir="models/"):
+
+def _training_rows(df, features, target):
+    """Numeric feature columns and target, restricted to rows with no missing values."""
+    # Remove 'date' or any non-numeric column from the features
+    X = df[features].copy()
+    if 'date' in X.columns:
+        X.drop(columns='date', inplace=True)
+
+    # Safety: Keep only numeric columns
+    X = X.select_dtypes(include=[np.number])
+
+    y = df[target]
+
+    # Early rows have no lag history; train only on complete rows
+    complete = X.notnull().all(axis=1) & y.notnull()
+    return X[complete], y[complete]
+
+
+def save_model(model, model_path):
+    """
+    Write the pickle and its NumPy-only artifact (see src.compiled_model) via temp file + rename,
+    so serving workers never read a partial model and reload it on their next request.
+    """
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    raw = buf.getvalue()
+
+    compiled = artifact_path(model_path)
+    if not save_artifact(model, compiled, hashlib.sha1(raw).hexdigest()) and os.path.exists(compiled):
+        os.remove(compiled)
+    atomic_write_bytes(model_path, raw)
+
+
+def _model_name(model):
+    return next((name for name, base in MODELS.items() if type(base) is type(model)), type(model).__name__)
+
+
+def update_and_save(city, df, target, features, new_rows, output_dir="models/"):
+    """
+    Incremental retrain after months were appended: keep the saved model's family, params and
+    features, and warm-start tree ensembles instead of rerunning feature selection and the search.
+    Args:
+        features (list): Features the saved model was trained on (its feature_names_in_ wins if present)
+        new_rows (int): Rows appended since it was trained; the saved model is scored on them first
+    Returns:
+        tuple: (model_path, model_name, metrics, features) like train_and_save, with metrics over the new rows
+    """
+    model_path = os.path.join(output_dir, f"{city.lower()}_{target}.pkl")
+    model = joblib.load(model_path)
+    features = [str(f) for f in getattr(model, 'feature_names_in_', features)]
+    X, y = _training_rows(df, features, target)
+    model_name = _model_name(model)
+
+    new_rows = min(new_rows, len(X))
+    metrics = {'MAE': float('nan'), 'RMSE': float('nan'), 'R2': float('nan'), 'new_rows': new_rows}
+    if new_rows > 0:
+        preds = model.predict(X.iloc[-new_rows:])
+        actual = y.iloc[-new_rows:]
+        metrics.update(MAE=mean_absolute_error(actual, preds), RMSE=_rmse(actual, preds))
+        if new_rows > 1:
+            metrics['R2'] = r2_score(actual, preds)
+
+    grow = isinstance(model, (RandomForestRegressor, GradientBoostingRegressor)) and \
+        model.n_estimators + WARM_START_ESTIMATORS <= WARM_START_MAX_ESTIMATORS
+    if grow:
+        # Forests add trees fitted on the full history; boosting adds stages on the current residuals
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + WARM_START_ESTIMATORS)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+    else:
+        model = clone(model).fit(X, y)
+    params = model.get_params()
+    metrics['params'] = {name: params[name] for name in PARAM_GRIDS.get(model_name, {})}
+    metrics['update'] = 'warm_start' if grow else 'refit'
+
+    save_model(model, model_path)
+    print(f"♻️ Updated model for {city} - {target} ({model_name}, {metrics['update']}) "
+          f"after {new_rows} new months; error on them before the update: MAE={metrics['MAE']:.1f}")
+    return model_path, model_name, metrics, features
+
+
+def train_and_save(city, df, target, output_dir="models/", n_jobs=1, save_feature_sets=True):
+    ranking_seconds = 0.0
     # Use custom features for Mumbai and Durgapur retail sales
     if city.lower() == "mumbai" and target == "retail_sales":
         top_features = [f for f in CUSTOM_MUMBAI_RETAIL_FEATURES if f in df.columns]
     elif city.lower() == "durgapur" and target == "retail_sales":
         top_features = [f for f in CUSTOM_DURGAPUR_RETAIL_FEATURES if f in df.columns]
     else:
-        top_features, _ = select_top_features(df, target)
+        top_features, importances = select_top_features(df, target, n_jobs=n_jobs)
+        ranking_seconds = importances.attrs.get('seconds', 0.0)
         # Drop specific unwanted columns
         excluded_cols = {'non_retail_sales', target, 'retail_sales'}
         top_features = [feat for feat in top_features if feat not in excluded_cols]
 
-    # Remove 'date' or any non-numeric column from top_features
-    X = df[top_features].copy()
-    if 'date' in X.columns:
-        X.drop(columns='date', inplace=True)
-
-    # Safety: Keep only numeric columns
-    X = X.select_dtypes(include=[np.number])
-
-    y = df[target]
-
-    model, model_name, metrics = evaluate_models(X, y)
+    X, y = _training_rows(df, top_features, target)
+    model, model_name, metrics = evaluate_models(X, y, n_jobs=n_jobs)
+    metrics['ranking_seconds'] = ranking_seconds
 
     os.makedirs(output_dir, exist_ok=True)
     model_path = os.path.join(output_dir, f"{city.lower()}_{target}.pkl")
-    joblib.dump(model, model_path)
+    save_model(model, model_path)
 
-    print(f"✅ Saved model for {city} - {target} using {model_name} with R2={metrics['R2']:.3f}")
+    print(f"✅ Saved model for {city} - {target} using {model_name} {metrics['params']} "
+          f"with CV R2={metrics['R2']:.3f}, RMSE={metrics['RMSE']:.1f}")
 
     # --- Save filtered features to JSON ---
-    feature_json_path = os.path.join(output_dir, "feature_sets.json")
-    if os.path.exists(feature_json_path):
-        with open(feature_json_path, "r") as f:
-            feature_sets = json.load(f)
-    else:
-        feature_sets = {}
-
-    feature_sets[f"{city.lower()}_{target}"] = top_features
+    # Batch runs merge every job's features once at the end instead (see src.batch_train)
+    if save_feature_sets:
+        feature_json_path = os.path.join(output_dir, "feature_sets.json")
+        if os.path.exists(feature_json_path):
+            with open(feature_json_path, "r") as f:
+                feature_sets = json.load(f)
+        else:
+            feature_sets = {}
 
-    with open(feature_json_path, "w") as f:
-        json.dump(feature_sets, f, indent=2)
+        feature_sets[f"{city.lower()}_{target}"] = top_features
+        atomic_write_json(feature_json_path, feature_sets)
 
-    return model_path, model_name, metrics
+    return model_path, model_name, metrics, top_features
 
 if __name__ == "__main__":
     cities = ["delhi", "mumbai", "chennai", "durgapur"]
     targets = ["retail_sales", "non_retail_sales"]  # List of target columns
 
     for city in cities:
-        file_path = f"data/{city}_pr.csv"
+        file_path = get_city_data_path(city)
         if not os.path.exists(file_path):
             print(f"❌ File not found: {file_path}")
             continue
-        df = pd.read_csv(file_path)
+        df = load_city_data(city)
         for target in targets:
             if target not in df.columns:
                 print(f"❌ Target column '{target}' not found in {file_path}")
                 continue
-            train_and_save(city, df, target)
\ No newline at end of file
+            train_and_save(city, df, target)
@@ -0,0 +1,250 @@
+"""
+Many-series forecasting in one pass.
+
+Series that forecast the same target from the same history dates are stacked into
+(series x month) buffers, the forecast spec is evaluated once for the whole stack, and every
+group of compatible compiled models predicts with a single call (src.compiled_model.predict_many).
+Each series' output equals what forecast_next_months returns for it; series that cannot be
+stacked (no trend_index, repeated months, or dates that differ from the rest of their group)
+go through forecast_next_months itself.
+"""
+import time
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from src.compiled_model import CompiledModel, predict_many
+from src.data_loader import load_city_data, get_data_version
+from src.feature_simulator import simulate_future_inputs, DEFAULT_SIMULATOR
+from src.feature_spec import forecast_features, compute_features, frame_buffers
+from src.forecast_cache import get_cached_forecast, put_cached_forecast
+from src.forecast_utils import forecast_next_months
+from src.logger import get_logger
+from src.metrics import observe, timer
+from src.model_loader import load_model, get_model_version
+from src.recursive_forecaster import BUFFER_COLUMNS
+from src.utils import generate_monthly_dates
+
+logger = get_logger(__name__)
+
+
+def _cache_key(city, target, simulator):
+    try:
+        return (city, target, get_data_version(city), get_model_version(city, target), simulator)
+    except Exception:
+        return None
+
+
+def _load_frame(city):
+    """The cached city frame, copied only if its columns need stripping or its rows sorting."""
+    try:
+        df = load_city_data(city, copy=False)
+        columns = df.columns.str.strip()
+        if not columns.equals(df.columns):
+            df = df.copy()
+            df.columns = columns
+        if 'date' not in df.columns:
+            logger.error("Expected 'date' column, found: %s", df.columns.tolist())
+            return None
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date')
+        return df
+    except Exception as e:
+        logger.error("Failed to read or format data for %s: %s", city, e)
+        return None
+
+
+def _load_series(city, target, months, simulator, frames, inputs):
+    """History, model and simulated inputs for one series, or None (logged) when it cannot be forecast."""
+    if city not in frames:
+        frames[city] = _load_frame(city)
+    df = frames[city]
+    if df is None:
+        return None
+
+    try:
+        if city not in inputs:
+            inputs[city] = simulate_future_inputs(df, months, simulator=simulator, version=get_data_version(city))
+        if inputs[city][0] is None:
+            raise ValueError("could not simulate future inputs")
+        model = load_model(city, target)
+    except Exception as e:
+        logger.error("Error while forecasting %s for %s: %s", target, city, e)
+        return None
+
+    dates = pd.DatetimeIndex(df['date'])
+    slots = np.asarray(dates.year * 12 + dates.month)
+    stackable = 'trend_index' in df.columns and bool(np.all(np.diff(slots) > 0))
+    return {'city': city, 'target': target, 'df': df, 'dates': dates, 'model': model,
+            'inputs': inputs[city], 'stackable': stackable}
+
+
+def _numeric_columns(df, columns):
+    """(columns x rows) float array, like stacking frame_buffers(df, columns) but in one conversion when possible."""
+    try:
+        return df.reindex(columns=columns).to_numpy(dtype=float).T
+    except (TypeError, ValueError):
+        return np.stack(list(frame_buffers(df, columns).values()))
+
+
+def last_valid(matrix):
+    """Last non-NaN value of each row (NaN for all-NaN rows)."""
+    valid = ~np.isnan(matrix)
+    last = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), matrix[np.arange(len(matrix)), last], np.nan)
+
+
+def forward_fill(matrix):
+    """Forward-fill NaN along axis 1 of a (series x rows x features) array."""
+    positions = np.arange(matrix.shape[1])[None, :, None]
+    idx = np.where(np.isnan(matrix), 0, positions)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return np.take_along_axis(matrix, idx, axis=1)
+
+
+@timer('build_features')
+def _group_features(target, series, months):
+    """
+    Model inputs for every series of a group, as build_forecast_features computes them per series.
+    Returns:
+        tuple: (future dates, list of (months x features) arrays in each model's feature order)
+    """
+    grid = max(series, key=lambda s: len(s['dates']))['dates']
+    n_max, count = len(grid), len(series)
+    future_dates = generate_monthly_dates(grid[-1] + relativedelta(months=1), months)
+    dates = grid.append(pd.DatetimeIndex(future_dates))
+
+    # Histories are right-aligned on the shared dates; the NaN padding reads like missing rows
+    names = list(dict.fromkeys(str(f) for s in series for f in s['model'].feature_names_in_))
+    columns = list(dict.fromkeys(BUFFER_COLUMNS + ['trend_index'] + names))
+    history = np.full((len(columns), count, n_max), np.nan)
+    for i, s in enumerate(series):
+        history[:, i, n_max - len(s['dates']):] = _numeric_columns(s['df'], columns)
+    history = dict(zip(columns, history))
+
+    buffers = {col: np.concatenate([history[col], np.full((count, months), np.nan)], axis=1)
+               for col in BUFFER_COLUMNS + ['trend_index']}
+    pri, sec, stk = (np.stack([np.asarray(s['inputs'][k][:months], dtype=float) for s in series]) for k in range(3))
+    for col, values in zip(['primary_price_avg', 'secondary_price_avg', 'price_diff'], [pri, sec, pri - sec]):
+        buffers[col][:, n_max:] = values
+
+    features = {'primary_price_avg': pri, 'secondary_price_avg': sec, 'stock_var': stk, 'price_diff': pri - sec}
+    features.update(compute_features(forecast_features(target), buffers, dates, np.arange(n_max, n_max + months)))
+
+    # Seed each input with its last known value in the stored history, then forward-fill the horizon
+    matrix = np.full((count, months + 1, len(names)), np.nan)
+    for j, name in enumerate(names):
+        matrix[:, 0, j] = last_valid(history[name])
+        if name in features:
+            matrix[:, 1:, j] = np.broadcast_to(features[name], (count, months))
+    filled = forward_fill(matrix)[:, 1:, :]
+
+    column = {name: j for j, name in enumerate(names)}
+    inputs = [filled[i][:, [column[str(f)] for f in s['model'].feature_names_in_]] for i, s in enumerate(series)]
+    return future_dates, inputs
+
+
+def _forecast_group(target, series, months):
+    """Forecast DataFrame per series (same rows and values as forecast_next_months)."""
+    future_dates, inputs = _group_features(target, series, months)
+    column = f'predicted_{target}'
+
+    valid_rows, models, matrices = [], [], []
+    for s, X in zip(series, inputs):
+        valid = ~np.isnan(X).any(axis=1)
+        for i in np.flatnonzero(~valid):
+            logger.error("Generated input for %s %s contains NaN. Skipping this prediction.",
+                         s['city'], future_dates[i].strftime('%b-%Y'))
+        valid_rows.append(np.flatnonzero(valid))
+        models.append(s['model'])
+        X = X[valid]
+        if not isinstance(s['model'], CompiledModel):
+            # Row-major, like the frame forecast_next_months passes, so BLAS sums in the same order
+            X = pd.DataFrame(np.ascontiguousarray(X), columns=list(s['model'].feature_names_in_), copy=False)
+        matrices.append(X)
+
+    with timer('predict', target=target, mode='panel'):
+        predictions = predict_many(models, matrices)
+
+    forecasts = []
+    for rows, y_pred in zip(valid_rows, predictions):
+        forecasts.append(pd.DataFrame([{'date': future_dates[i], column: value} for i, value in zip(rows, y_pred)]))
+    return future_dates, forecasts
+
+
+def _slice(forecast_df, future_dates, months):
+    if months == len(future_dates) or forecast_df.empty:
+        return forecast_df.copy()
+    return forecast_df[forecast_df['date'] <= future_dates[months - 1]].reset_index(drop=True)
+
+
+def forecast_panel(jobs, simulator=None):
+    """
+    Forecast many (city, target, months) jobs in one vectorized pass.
+    Args:
+        jobs (list): (city, target, months) tuples
+        simulator (str): Exogenous input simulator (see src.feature_simulator)
+    Returns:
+        list: One DataFrame per job, in job order, equal to forecast_next_months' result (None where it fails)
+    """
+    start = time.perf_counter()
+    simulator = simulator or DEFAULT_SIMULATOR
+    results = [None] * len(jobs)
+
+    # Serve cached forecasts; every other (city, target) is forecast once, for its longest horizon
+    pending = {}
+    for i, (city, target, months) in enumerate(jobs):
+        key = _cache_key(city, target, simulator)
+        cached = get_cached_forecast(key, months) if key is not None else None
+        if cached is not None:
+            results[i] = cached
+            continue
+        entry = pending.setdefault((city, target), {'jobs': [], 'months': 0, 'key': key})
+        entry['jobs'].append(i)
+        entry['months'] = max(entry['months'], months)
+
+    groups, fallback = {}, []
+    frames, inputs = {}, {}
+    horizon = max((entry['months'] for entry in pending.values()), default=0)
+    for (city, target), entry in pending.items():
+        series = _load_series(city, target, horizon, simulator, frames, inputs)
+        if series is None:
+            continue
+        series.update(entry)
+        if series['stackable']:
+            groups.setdefault((target, series['dates'][-1]), []).append(series)
+        else:
+            fallback.append(series)
+
+    predict_groups = stacked_count = 0
+    for (target, _), members in groups.items():
+        # Every member must cover the tail of the longest history, month for month
+        grid = max(members, key=lambda s: len(s['dates']))['dates']
+        stacked = [s for s in members if grid[len(grid) - len(s['dates']):].equals(s['dates'])]
+        fallback += [s for s in members if not any(s is t for t in stacked)]
+
+        months = max(s['months'] for s in stacked)
+        try:
+            future_dates, forecasts = _forecast_group(target, stacked, months)
+        except Exception as e:
+            logger.error("Panel forecast failed for %s: %s; forecasting its series one by one", target, e)
+            fallback += stacked
+            continue
+        stacked_count += len(stacked)
+        predict_groups += len({s['model'].group_key if isinstance(s['model'], CompiledModel) else id(s['model'])
+                               for s in stacked})
+        for s, forecast_df in zip(stacked, forecasts):
+            if s['key'] is not None:
+                put_cached_forecast(s['key'], months, future_dates, forecast_df)
+            for i in s['jobs']:
+                results[i] = _slice(forecast_df, future_dates, jobs[i][2])
+
+    for s in fallback:
+        for i in s['jobs']:
+            results[i] = forecast_next_months(*jobs[i], simulator=simulator)
+
+    elapsed = time.perf_counter() - start
+    observe('forecast_panel', elapsed)
+    logger.info("Panel forecast of %d jobs: %d series stacked in %d groups (%d predict calls), %d one by one",
+                len(jobs), stacked_count, len(groups), predict_groups,
+                len(fallback), extra={'jobs': len(jobs), 'duration_ms': round(elapsed * 1000, 3)})
+    return results
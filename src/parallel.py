@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError
+from src.forecast_utils import forecast_next_months
+from src.logger import get_logger, run_with_context
+
+logger = get_logger(__name__)
+
+# 'thread' (default), 'process' or 'serial'
+FORECAST_EXECUTOR = os.environ.get('FORECAST_EXECUTOR', 'thread')
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS', min(12, os.cpu_count() or 4)))
+FORECAST_TASK_TIMEOUT = float(os.environ.get('FORECAST_TASK_TIMEOUT', 60))
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(kind=None, max_workers=None):
+    """Return the shared pool for `kind`, creating it on first use. 'serial' returns None."""
+    kind = kind or FORECAST_EXECUTOR
+    max_workers = max_workers or FORECAST_WORKERS
+    if kind == 'serial':
+        return None
+    if kind not in ('thread', 'process'):
+        raise ValueError(f"Unknown executor '{kind}'. Choose from ['thread', 'process', 'serial'].")
+
+    with _executors_lock:
+        key = (kind, max_workers)
+        executor = _executors.get(key)
+        if executor is None:
+            pool_cls = ThreadPoolExecutor if kind == 'thread' else ProcessPoolExecutor
+            executor = _executors[key] = pool_cls(max_workers=max_workers)
+        return executor
+
+
+def _run_one(job):
+    city, target, months = job
+    try:
+        return forecast_next_months(city, target, months)
+    except Exception as e:
+        logger.error(f"Forecast job failed for {city} {target}: {e}")
+        return None
+
+
+def iter_forecast_jobs(jobs, kind=None, max_workers=None, timeout=None):
+    """
+    Submit every (city, target, months) job at once and yield results in job order as
+    they complete, so callers can stream early jobs while later ones are still running.
+    Args:
+        jobs (list): (city, target, months) tuples
+        kind (str): 'thread', 'process' or 'serial'; defaults to FORECAST_EXECUTOR
+        max_workers (int): Pool size; defaults to FORECAST_WORKERS
+        timeout (float): Seconds each job may take from submission; defaults to FORECAST_TASK_TIMEOUT
+    Yields:
+        pd.DataFrame: One per job, in job order. Failed or timed-out jobs give None.
+    """
+    timeout = FORECAST_TASK_TIMEOUT if timeout is None else timeout
+    executor = get_executor(kind, max_workers)
+    if executor is None:
+        for job in jobs:
+            yield _run_one(job)
+        return
+
+    if isinstance(executor, ThreadPoolExecutor):
+        # Threads inherit the caller's request id for logging; process workers cannot
+        futures = [executor.submit(run_with_context(_run_one, job)) for job in jobs]
+    else:
+        futures = [executor.submit(_run_one, job) for job in jobs]
+    # One deadline per job, so waiting on earlier jobs does not extend later ones' budget
+    deadline = time.monotonic() + timeout
+    for job, future in zip(jobs, futures):
+        try:
+            yield future.result(timeout=max(deadline - time.monotonic(), 0))
+        except TimeoutError:
+            future.cancel()
+            logger.error(f"Forecast job timed out after {timeout}s: {job}")
+            yield None
+        except Exception as e:
+            logger.error(f"Forecast job failed: {job} | {e}")
+            yield None
+
@@ -1,45 +1,69 @@
 import pandas as pd
 import numpy as np
-from dateutil.relativedelta import relativedelta
-
-def get_value_or_nan(df, col, date):
-    match = df[df['date'] == date]
-    return match[col].values[0] if not match.empty else np.nan
-
-def generate_next_month_features(df, target, pri, sec, stk, date):
-    new_row = {
-        'date': date,
-        'primary_price_avg': pri,
-        'secondary_price_avg': sec,
-        'stock_var': stk,
-        'price_diff': pri - sec,
-        'month_sin': np.sin(2 * np.pi * date.month / 12),
-        'month_cos': np.cos(2 * np.pi * date.month / 12),
-        'year': date.year,
-        'quarter': date.quarter,
-        'trend_index': df['trend_index'].max() + 1 if 'trend_index' in df.columns else len(df) + 1
-    }
-
-    # Generate lag features
-    for lag in [1, 2, 3]:
-        lag_date = date - relativedelta(months=lag)
-        for col in ['retail_sales', 'non_retail_sales', 'primary_price_avg', 'secondary_price_avg', 'price_diff']:
-            new_row[f'{col}_lag_{lag}'] = get_value_or_nan(df, col, lag_date)
-
-    # Generate rolling averages
-    for col in ['primary_price_avg', 'secondary_price_avg', 'retail_sales', 'non_retail_sales']:
-        if col in df.columns and len(df[col].dropna()) >= 3:
-            new_row[f'{col}_roll3'] = df[col].iloc[-3:].mean()
-
-    # Custom averages
-    if 'non_retail_sales' in df.columns:
-        new_row['non_retail_sales_custom_avg'] = df['non_retail_sales'].iloc[-6:].mean() if len(df) >= 6 else df['non_retail_sales'].mean()
-
-    # Add lag_12 for yearly seasonality
-    lag_12_date = date - relativedelta(months=12)
-    if target == 'retail_sales':
-        new_row['retail_sales_lag_12'] = get_value_or_nan(df, 'retail_sales', lag_12_date)
-    elif target == 'non_retail_sales':
-        new_row['non_retail_sales_lag_12'] = get_value_or_nan(df, 'non_retail_sales', lag_12_date)
-
-    return new_row
+from src.feature_spec import FORECAST_FEATURES, forecast_features, compute_features, frame_buffers, spec_sources, lags
+from src.metrics import timer
+
+# History columns the forecast spec reads, for either sales target
+BUFFER_COLUMNS = spec_sources(FORECAST_FEATURES + lags('retail_sales', [12]) + lags('non_retail_sales', [12]))
+# Simulated inputs written into the future rows of the buffers
+FUTURE_COLUMNS = ['primary_price_avg', 'secondary_price_avg', 'price_diff']
+
+
+def _forecast_buffers(df, months, future_values):
+    """Row buffers for the history followed by `months` simulated rows."""
+    n = len(df)
+    buffers = {}
+    for col, values in frame_buffers(df, BUFFER_COLUMNS).items():
+        buf = np.full(n + months, np.nan)
+        buf[:n] = values
+        if col in future_values:
+            buf[n:] = future_values[col]
+        buffers[col] = buf
+    if 'trend_index' in df.columns:
+        buffers['trend_index'] = np.concatenate([frame_buffers(df, ['trend_index'])['trend_index'], np.full(months, np.nan)])
+    return buffers
+
+
+@timer('build_features')
+def build_forecast_features(df, target, pri_trend, sec_trend, stk_trend, future_dates, feature_names):
+    """
+    Inputs for every future month at once: the forecast spec evaluated on the history followed
+    by the simulated months, with each model input forward-filled from its last known value.
+    Args:
+        df (pd.DataFrame): History sorted by date
+        target (str): Column being forecast
+        pri_trend, sec_trend, stk_trend (list): Simulated exogenous inputs, one per future month
+        future_dates (list): Dates of the future months
+        feature_names (list): Columns the model expects
+    Returns:
+        pd.DataFrame: One row per future month with 'date' and every column of feature_names
+    """
+    months = len(future_dates)
+    n = len(df)
+    future_dates = pd.DatetimeIndex(future_dates)
+    pri = np.asarray(pri_trend[:months], dtype=float)
+    sec = np.asarray(sec_trend[:months], dtype=float)
+    stk = np.asarray(stk_trend[:months], dtype=float)
+
+    # Predictions are never fed back, so the sales columns stay NaN for future rows
+    future_values = {'primary_price_avg': pri, 'secondary_price_avg': sec, 'price_diff': pri - sec}
+    buffers = _forecast_buffers(df, months, future_values)
+    dates = pd.DatetimeIndex(df['date']).append(future_dates)
+
+    features = {'primary_price_avg': pri, 'secondary_price_avg': sec, 'stock_var': stk, 'price_diff': pri - sec}
+    features.update(compute_features(forecast_features(target), buffers, dates, np.arange(n, n + months)))
+
+    # Forward-fill every model input, seeded with its last known historical value
+    matrix = np.full((months + 1, len(feature_names)), np.nan)
+    for j, name in enumerate(feature_names):
+        if name in df.columns:
+            hist = pd.to_numeric(df[name], errors='coerce')
+            last_valid = hist.last_valid_index()
+            if last_valid is not None:
+                matrix[0, j] = hist.loc[last_valid]
+        if name in features:
+            matrix[1:, j] = features[name]
+    filled = pd.DataFrame(matrix, columns=list(feature_names)).ffill().iloc[1:]
+
+    filled.insert(0, 'date', future_dates)
+    return filled.reset_index(drop=True)
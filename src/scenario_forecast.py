@@ -0,0 +1,205 @@
+"""
+Monte Carlo scenario forecasts.
+
+Instead of the single simulated trend behind a point forecast, many paths of the exogenous
+inputs are sampled (src.feature_simulator.simulate_input_paths) and every path is forecast in
+one NumPy batch: features that only read history are computed once, the ones that read the
+simulated prices are evaluated for all paths as (paths x rows) buffers, and each model predicts
+all paths x months rows in a single call. The result is a quantile band per month.
+"""
+import os
+import time
+import warnings
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from src.compiled_model import CompiledModel
+from src.data_loader import load_city_data, get_data_version
+from src.feature_simulator import simulate_input_paths, DEFAULT_SIMULATOR, EXOGENOUS_COLUMNS, SIMULATORS
+from src.feature_spec import forecast_features, compute_features, frame_buffers, spec_sources
+from src.forecast_service import validate_job, model_jobs, get_result_column
+from src.logger import get_logger
+from src.metrics import observe, timer
+from src.model_loader import load_model
+from src.panel_forecast import last_valid, forward_fill
+from src.recursive_forecaster import BUFFER_COLUMNS, FUTURE_COLUMNS
+from src.utils import generate_monthly_dates
+
+logger = get_logger(__name__)
+
+# Paths sampled when a request does not say, and the most one request may ask for
+SCENARIO_PATHS = int(os.environ.get('SCENARIO_PATHS', 1000))
+MAX_SCENARIO_PATHS = int(os.environ.get('MAX_SCENARIO_PATHS', 5000))
+QUANTILES = (0.1, 0.5, 0.9)
+
+# History rows kept in the per-path buffers; enough for every price lag and window in FORECAST_FEATURES
+PATH_CONTEXT_ROWS = 24
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_scenario_options(options):
+    """
+    Check forecast_scenarios keyword options coming from a request (JSON types).
+    Raises ValueError with a user-facing message for anything forecast_scenarios cannot use.
+    """
+    paths = options.get('paths', SCENARIO_PATHS)
+    if not isinstance(paths, int) or isinstance(paths, bool) or not 1 <= paths <= MAX_SCENARIO_PATHS:
+        raise ValueError(f"Invalid paths '{paths}'. Choose an integer between 1 and {MAX_SCENARIO_PATHS}.")
+    simulator = options.get('simulator')
+    if simulator is not None and simulator not in SIMULATORS:
+        raise ValueError(f"Unknown simulator '{simulator}'. Choose from {list(SIMULATORS)}.")
+    if not isinstance(options.get('bootstrap', True), bool):
+        raise ValueError("'bootstrap' must be true or false.")
+    seed = options.get('seed')
+    if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+        raise ValueError("'seed' must be a non-negative integer.")
+
+    shocks = options.get('shocks') or {}
+    if not isinstance(shocks, dict):
+        raise ValueError("'shocks' must map input columns to relative shocks.")
+    for col, shock in shocks.items():
+        if col not in EXOGENOUS_COLUMNS:
+            raise ValueError(f"Unknown shock column '{col}'. Choose from {EXOGENOUS_COLUMNS}.")
+        values = shock if isinstance(shock, list) else [shock]
+        if not values or not all(_is_number(v) and v > -1 for v in values):
+            raise ValueError(f"Shocks for '{col}' must be a number or a non-empty list of numbers above -1 "
+                             f"(0.1 = +10%).")
+
+
+@lru_cache(maxsize=None)
+def _path_specs(target):
+    """The part of forecast_features(target) that reads a simulated input."""
+    return [spec for spec in forecast_features(target) if set(spec_sources([spec])) & set(FUTURE_COLUMNS)]
+
+
+def _load_history(city):
+    df = load_city_data(city)
+    df.columns = df.columns.str.strip()
+    if 'date' not in df.columns:
+        raise ValueError(f"Dataset for {city} has no 'date' column.")
+    return df.sort_values('date').reset_index(drop=True)
+
+
+@timer('build_features')
+def build_path_features(df, target, inputs, future_dates, feature_names):
+    """
+    build_forecast_features for many input paths at once.
+    Args:
+        df (pd.DataFrame): History sorted by date
+        target (str): Column being forecast
+        inputs (np.ndarray): (paths, months, 3) primary price, secondary price and stock_var
+        future_dates (list): Dates of the future months
+        feature_names (list): Columns the model expects
+    Returns:
+        np.ndarray: (paths, months, features) model inputs in feature_names order
+    """
+    paths, months = inputs.shape[:2]
+    n = len(df)
+    pri, sec, stk = inputs[..., 0], inputs[..., 1], inputs[..., 2]
+    simulated = {'primary_price_avg': pri, 'secondary_price_avg': sec, 'price_diff': pri - sec}
+    dates = pd.DatetimeIndex(df['date']).append(pd.DatetimeIndex(future_dates))
+    positions = np.arange(n, n + months)
+
+    # Every feature from one 1-D pass; only the simulated-input ones differ between paths
+    columns = BUFFER_COLUMNS + (['trend_index'] if 'trend_index' in df.columns else [])
+    buffers = {col: np.concatenate([values, np.full(months, np.nan)]) for col, values in frame_buffers(df, columns).items()}
+    features = compute_features(forecast_features(target), buffers, dates, positions)
+
+    lo = max(n - PATH_CONTEXT_ROWS, 0)
+    path_buffers = {}
+    for col in spec_sources(_path_specs(target)):
+        history = np.broadcast_to(buffers[col][lo:n], (paths, n - lo))
+        path_buffers[col] = np.concatenate([history, simulated.get(col, np.full((paths, months), np.nan))], axis=1)
+    features.update(compute_features(_path_specs(target), path_buffers, dates[lo:], positions - lo))
+    features.update(simulated, stock_var=stk)
+
+    # Seed each input with its last known value, then forward-fill the horizon (per path)
+    history = np.stack(list(frame_buffers(df, [str(f) for f in feature_names]).values()))
+    matrix = np.full((paths, months + 1, len(feature_names)), np.nan)
+    matrix[:, 0, :] = last_valid(history)
+    for j, name in enumerate(feature_names):
+        if name in features:
+            matrix[:, 1:, j] = np.broadcast_to(features[name], (paths, months))
+    return forward_fill(matrix)[:, 1:, :]
+
+
+def _predict_paths(model, X):
+    """(paths, months) predictions, NaN where an input is missing."""
+    paths, months, width = X.shape
+    rows = X.reshape(-1, width)
+    valid = ~np.isnan(rows).any(axis=1)
+    predictions = np.full(len(rows), np.nan)
+    if valid.any():
+        rows = rows[valid]
+        if not isinstance(model, CompiledModel):
+            rows = pd.DataFrame(rows, columns=list(model.feature_names_in_))
+        predictions[valid] = model.predict(rows)
+    return predictions.reshape(paths, months)
+
+
+def forecast_scenarios(city, target, months=6, paths=None, simulator=None, shocks=None, bootstrap=True,
+                       seed=None, quantiles=QUANTILES):
+    """
+    Quantile bands of a city forecast over sampled scenarios of its exogenous inputs.
+    Args:
+        city (str): City (Whole India is not supported)
+        target (str): retail_sales, non_retail_sales or total_sales (the sum of both, per path)
+        months (int): Forecast horizon
+        paths (int): Number of scenarios; defaults to SCENARIO_PATHS
+        simulator (str): Trend the paths are sampled around (see src.feature_simulator)
+        shocks (dict): Relative input shocks, as for simulate_input_paths
+        bootstrap (bool): Whether to resample historical residuals around the trend
+        seed (int): Random seed, for reproducible scenarios
+        quantiles (tuple): Quantiles to report, e.g. (0.1, 0.5, 0.9)
+    Returns:
+        pd.DataFrame: date and one column per quantile (e.g. predicted_retail_sales_p10);
+            attrs hold the number of 'paths'
+    """
+    start = time.perf_counter()
+    city, target, months = validate_job(city, target, months)
+    if city == 'india':
+        raise ValueError("Scenario forecasts are available per city, not for Whole India.")
+    paths = SCENARIO_PATHS if paths is None else int(paths)
+    if not 1 <= paths <= MAX_SCENARIO_PATHS:
+        raise ValueError(f"Invalid paths '{paths}'. Choose between 1 and {MAX_SCENARIO_PATHS}.")
+    simulator = simulator or DEFAULT_SIMULATOR
+
+    df = _load_history(city)
+    inputs = simulate_input_paths(df, months, paths, simulator=simulator, version=get_data_version(city),
+                                  shocks=shocks, bootstrap=bootstrap, seed=seed)
+    if inputs is None:
+        raise ValueError(f"Could not simulate future inputs for {city}.")
+    future_dates = generate_monthly_dates(df['date'].max() + relativedelta(months=1), months)
+
+    # total_sales is summed per path, so its bands come from the joint distribution
+    totals = np.zeros((paths, months))
+    for _, model_target, _ in model_jobs(city, target, months):
+        model = load_model(city, model_target)
+        X = build_path_features(df, model_target, inputs, future_dates, model.feature_names_in_)
+        with timer('predict', city=city, target=model_target, mode='scenario'):
+            totals += _predict_paths(model, X)
+
+    valid = ~np.isnan(totals).all(axis=0)
+    for date in np.asarray(future_dates)[~valid]:
+        logger.error("Generated input for %s contains NaN in every path. Skipping this prediction.",
+                     pd.Timestamp(date).strftime('%b-%Y'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        bands = np.nanquantile(totals[:, valid], quantiles, axis=0)
+
+    column = get_result_column(target)
+    forecast_df = pd.DataFrame({'date': pd.DatetimeIndex(future_dates)[valid]})
+    for q, values in zip(quantiles, bands):
+        forecast_df[f"{column}_p{round(q * 100):d}"] = values
+    forecast_df.attrs['paths'] = paths
+
+    elapsed = time.perf_counter() - start
+    observe('forecast_scenarios', elapsed, city=city, target=target)
+    logger.info("Forecasted %d scenarios of %d months of %s for %s", paths, months, target, city,
+                extra={'city': city, 'target': target, 'months': months, 'paths': paths,
+                       'duration_ms': round(elapsed * 1000, 3)})
+    return forecast_df
@@ -0,0 +1,154 @@
+import argparse
+import io
+import os
+import numpy as np
+import pandas as pd
+from src.utils import atomic_write_bytes
+
+DATA_DIR = "data"
+DATE_FORMAT = '%d-%m-%Y'
+
+# Storage format for data/{city}_pr.*: 'csv' (default), 'npz', 'parquet' or 'feather'.
+# parquet/feather need pyarrow. Every backend is read in full and decoded from bytes (see data_loader).
+DATA_BACKEND = os.environ.get('DATA_BACKEND', 'csv')
+
+EXTENSIONS = {'csv': 'csv', 'npz': 'npz', 'parquet': 'parquet', 'feather': 'feather'}
+
+
+def parse_csv(source):
+    """Read a city CSV (path or buffer), parsing dd-mm-YYYY dates."""
+    df = pd.read_csv(source)
+    try:
+        df['date'] = pd.to_datetime(df['date'], format=DATE_FORMAT)
+    except (ValueError, TypeError):
+        # Fall back to the slow path for rows not written as dd-mm-YYYY
+        df['date'] = pd.to_datetime(df['date'], dayfirst=True)
+    return df
+
+
+def _encode_csv(df):
+    out = df.copy()
+    out['date'] = out['date'].dt.strftime(DATE_FORMAT)
+    return out.to_csv(index=False).encode()
+
+
+def _decode_csv(raw):
+    return parse_csv(io.BytesIO(raw))
+
+
+def _encode_npz(df):
+    arrays = {'__columns__': np.array(df.columns, dtype=str)}
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            arrays[f'c{i}'] = values.to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(values):
+            arrays[f'c{i}'] = values.to_numpy()
+        else:
+            arrays[f'c{i}'] = values.astype(str).to_numpy(dtype=str)
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _decode_npz(raw):
+    with np.load(io.BytesIO(raw), allow_pickle=False) as data:
+        columns = data['__columns__'].tolist()
+        return pd.DataFrame({col: data[f'c{i}'] for i, col in enumerate(columns)})
+
+
+def _require_pyarrow(backend):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"The '{backend}' data backend requires pyarrow. Install it or set DATA_BACKEND=csv.")
+
+
+def _encode_parquet(df):
+    _require_pyarrow('parquet')
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+def _decode_parquet(raw):
+    _require_pyarrow('parquet')
+    return pd.read_parquet(io.BytesIO(raw))
+
+
+def _encode_feather(df):
+    _require_pyarrow('feather')
+    buf = io.BytesIO()
+    df.reset_index(drop=True).to_feather(buf, compression='uncompressed')
+    return buf.getvalue()
+
+
+def _decode_feather(raw):
+    _require_pyarrow('feather')
+    return pd.read_feather(io.BytesIO(raw))
+
+
+CODECS = {
+    'csv': (_encode_csv, _decode_csv),
+    'npz': (_encode_npz, _decode_npz),
+    'parquet': (_encode_parquet, _decode_parquet),
+    'feather': (_encode_feather, _decode_feather),
+}
+
+
+def _codec(backend):
+    backend = backend or DATA_BACKEND
+    if backend not in CODECS:
+        raise ValueError(f"Unknown data backend '{backend}'. Choose from {list(CODECS)}.")
+    return CODECS[backend]
+
+
+def get_storage_path(city, backend=None):
+    backend = backend or DATA_BACKEND
+    _codec(backend)
+    return os.path.join(DATA_DIR, f"{city}_pr.{EXTENSIONS[backend]}")
+
+
+def encode_frame(df, backend=None):
+    """Serialize a city DataFrame (with a datetime 'date' column) to bytes."""
+    return _codec(backend)[0](df)
+
+
+def decode_frame(raw, backend=None):
+    """Inverse of encode_frame; 'date' always comes back as datetime64."""
+    return _codec(backend)[1](raw)
+
+
+def read_city_frame(city, backend=None):
+    with open(get_storage_path(city, backend), 'rb') as f:
+        return decode_frame(f.read(), backend)
+
+
+def convert_city(city, source, target):
+    """Rewrite data/{city}_pr.<source> as data/{city}_pr.<target>. Returns the new path."""
+    df = read_city_frame(city, source)
+    path = get_storage_path(city, target)
+    atomic_write_bytes(path, encode_frame(df, target))
+    return path
+
+
+def import_csv(city, backend=None):
+    """Convert data/{city}_pr.csv into the configured binary backend."""
+    return convert_city(city, 'csv', backend or DATA_BACKEND)
+
+
+def export_csv(city, backend=None):
+    """Write data/{city}_pr.csv from the configured binary backend."""
+    return convert_city(city, backend or DATA_BACKEND, 'csv')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert city datasets between CSV and binary backends.")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('cities', nargs='+')
+    parser.add_argument('--backend', default=DATA_BACKEND if DATA_BACKEND != 'csv' else 'npz', choices=[b for b in CODECS if b != 'csv'])
+    args = parser.parse_args()
+
+    for city in args.cities:
+        convert = import_csv if args.action == 'import' else export_csv
+        print(f"✅ {city}: wrote {convert(city, args.backend)}")
@@ -1,7 +1,18 @@
 import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
 import pandas as pd
 from dateutil.relativedelta import relativedelta
-import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
 
 def generate_monthly_dates(start_date, months):
     start_date = pd.to_datetime(start_date)  # ✅ ensure it's datetime
@@ -25,3 +36,47 @@ def validate_city_and_target(city, target):
     
     if target.lower() not in valid_targets:
         raise ValueError(f"Invalid sales type '{target}'. Choose from {valid_targets}.")
+
+
+def atomic_write_json(path, data, indent=2):
+    """Write JSON to a temp file in the same directory and rename it over `path`."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """Write bytes to a temp file in the same directory and rename it over `path`."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on `path` across threads and, where fcntl exists, across processes."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,145 @@
+"""
+Sheets read/write paths against the in-process FakeWorksheet, so no credentials or network are needed.
+Run from the repository root: python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from src import google_sheets_utils as sheets
+from src.google_sheets_utils import FakeWorksheet
+
+TAB = 'mumbai'
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch):
+    """Fresh in-memory tabs and empty caches for every test."""
+    monkeypatch.setattr(sheets, 'SHEETS_BACKEND', 'fake')
+    monkeypatch.setattr(sheets, '_fake_tabs', {})
+    monkeypatch.setattr(sheets, '_pending_rows', {})
+    monkeypatch.setattr(sheets, '_worksheets', {})
+    monkeypatch.setattr(sheets, '_clients', {})
+
+
+def reference_read(data):
+    """read_sheet_as_df as it stood before the rewrite (applymap is DataFrame.map in pandas 3)."""
+    if not data or len(data) < 2:
+        return pd.DataFrame()
+    headers = [h.strip() for h in data[0]]
+    df = pd.DataFrame(data[1:], columns=headers)
+    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
+    for col in df.columns:
+        col_clean = col.lower()
+        if col_clean == 'date':
+            df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+        elif col_clean not in ['month', 'city']:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def city_frame(rows):
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=rows, freq='MS'),
+        'retail_sales': np.arange(rows, dtype=float) * 1000 + 0.5,
+        'stock_var': np.arange(rows) * 10,
+    })
+
+
+def test_write_sends_only_changed_rows_and_shrinks_tab():
+    df = city_frame(6)
+    sheets.write_df_to_sheet(df, TAB)
+    tab = sheets.get_fake_worksheet(TAB)
+    assert tab.values[0] == ['date', 'retail_sales', 'stock_var']
+    assert tab.values[3] == ['01-03-2024', '2000.5', '20']
+
+    updates = []
+    original = FakeWorksheet.batch_update
+    tab.batch_update = lambda data, value_input_option=None: (updates.extend(data), original(tab, data, value_input_option))
+
+    changed = df.copy()
+    changed.loc[2, 'retail_sales'] = 42.0
+    assert sheets.write_df_to_sheet(changed, TAB) == 1
+    assert updates == [{'range': 'A4:C4', 'values': [['01-03-2024', '42', '20']]}]
+
+    updates.clear()
+    sheets.write_df_to_sheet(changed.head(3), TAB)
+    assert tab.row_count == 4 and tab.col_count == 3
+    assert updates == []
+    assert tab.values == sheets._to_grid(changed.head(3))
+
+
+def test_queued_rows_are_sent_in_one_append_in_header_order(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_APPEND_BATCH', 10)
+    tab = sheets.get_fake_worksheet(TAB)
+    tab.values = [['date', 'retail_sales', 'city']]
+
+    appended = []
+    tab.append_rows = lambda rows, value_input_option=None: appended.append(rows)
+    for month in (1, 2, 3):
+        sheets.queue_row_for_sheet({'city': 'mumbai', 'retail_sales': 1000.125 * month,
+                                    'date': pd.Timestamp(2025, month, 1)}, TAB)
+    assert appended == []
+
+    assert sheets.flush_sheet_appends() == 3
+    assert appended == [[['01-01-2025', '1000.12', 'mumbai'],
+                         ['01-02-2025', '2000.25', 'mumbai'],
+                         ['01-03-2025', '3000.38', 'mumbai']]]
+    assert sheets.flush_sheet_appends() == 0
+
+
+def test_full_batch_is_sent_without_flush(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_APPEND_BATCH', 2)
+    tab = sheets.get_fake_worksheet(TAB)
+    tab.values = [['date', 'city']]
+    sheets.queue_row_for_sheet({'date': '01-01-2025', 'city': 'a'}, TAB)
+    sheets.queue_row_for_sheet({'date': '01-02-2025', 'city': 'b'}, TAB)
+    assert tab.values[1:] == [['01-01-2025', 'a'], ['01-02-2025', 'b']]
+    assert sheets.flush_sheet_appends() == 0
+
+
+def test_read_matches_previous_coercion():
+    data = [
+        [' date ', 'Month', 'city', 'retail_sales', 'stock_var', 'note'],
+        ['01-02-2024', ' Feb ', ' mumbai ', ' 1200.5 ', '', 'x'],
+        ['13-02-2024', 'Feb', 'delhi', '1,200', '-40', ' 7 '],
+        ['not a date', 'Mar', '', 'abc', '3e2', ''],
+        ['2024-03-31', '', 'chennai', '0', ' 12 ', '1.0'],
+    ]
+    sheets.get_fake_worksheet(TAB).values = data
+    pd.testing.assert_frame_equal(sheets.read_sheet_as_df(TAB), reference_read(data), check_dtype=False)
+
+
+def test_read_short_tab_is_empty():
+    sheets.get_fake_worksheet(TAB).values = [['date', 'city']]
+    assert sheets.read_sheet_as_df(TAB).empty
+
+
+class CountingClient:
+    """Stands in for an authorized gspread client; counts spreadsheet opens."""
+
+    def __init__(self):
+        self.opens = 0
+        self.tabs = {}
+
+    def open_by_key(self, key):
+        self.opens += 1
+        return self
+
+    def worksheet(self, name):
+        return self.tabs.setdefault(name, FakeWorksheet(name, [['date', 'city']]))
+
+
+def test_worksheet_and_headers_are_reused(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_BACKEND', 'google')
+    client = CountingClient()
+    sheets._clients['credentials.json'] = client
+
+    sheets.append_row_to_sheet({'date': '01-01-2025', 'city': 'a'}, TAB)
+    tab = client.tabs[TAB]
+    calls = tab.calls
+    sheets.append_row_to_sheet({'date': '01-02-2025', 'city': 'b'}, TAB)
+
+    assert client.opens == 1
+    assert sheets.get_worksheet(TAB) is tab
+    assert tab.calls == calls + 1  # the append only; headers were not read again
+    assert tab.values[1:] == [['01-01-2025', 'a'], ['01-02-2025', 'b']]